@@ -3,29 +3,64 @@
 Единственная точка входа для пользовательских команд.
 """
 import shlex
+import sys
+from functools import lru_cache
+from operator import attrgetter, itemgetter
 
+from ..core.currencies import get_all_currency_codes_str
 from ..core.exceptions import (
     ApiRequestError,
     CurrencyNotFoundError,
     InsufficientFundsError,
 )
-
-# --- ИЗМЕНЕНИЕ: Возвращаем импорт классов ---
-from ..core.usecases import (
-    AuthService,
-    PortfolioService,
-    RateService,
-)
 from ..core.utils import format_currency
-from ..parser_service.updater import RatesUpdater
 
 current_user = None
+# Событие остановки фонового обновления курсов (None — не запущено)
+_schedule_stop = None
+
+# Служебные ключи rates.json, не являющиеся валютными парами
+_CACHE_META_KEYS = frozenset({"source", "last_refresh"})
+
+
+def _emit(lines):
+    """Выводит накопленные строки одной записью в stdout."""
+    sys.stdout.write("\n".join(lines) + "\n")
+
+
+# --- Кешированные экземпляры сервисов ---
+# REPL однопоточный, поэтому lru_cache достаточно: каждый сервис создается
+# один раз за сессию, а не на каждую команду.
+# Модули сервисов импортируются при первом обращении, чтобы разовые команды
+# не тянули за собой весь стек (в частности, HTTP-клиенты парсера).
+@lru_cache(maxsize=1)
+def _auth_service():
+    from ..core.usecases import AuthService
+    return AuthService()
+
+
+@lru_cache(maxsize=1)
+def _rate_service():
+    from ..core.usecases import RateService
+    return RateService()
+
+
+@lru_cache(maxsize=1)
+def _portfolio_service():
+    from ..core.usecases import PortfolioService
+    return PortfolioService(_rate_service())
+
+
+@lru_cache(maxsize=1)
+def _rates_updater():
+    from ..parser_service.updater import RatesUpdater
+    return RatesUpdater()
 
 
 def handle_register(username, password):
     """Обработчик команды register."""
     try:
-        auth_service = AuthService()
+        auth_service = _auth_service()
         user = auth_service.register(username, password)
         print(
             f" Пользователь '{user.username}' успешно зарегистрирован "
@@ -45,7 +80,7 @@ def handle_login(username, password):
     """Обработчик команды login."""
     global current_user
     try:
-        auth_service = AuthService()
+        auth_service = _auth_service()
         user = auth_service.login(username, password)
         current_user = user
         print(f" Успешный вход для пользователя: {user.username}")
@@ -59,8 +94,7 @@ def handle_buy(currency_code, amount_str):
     """Обработчик команды buy."""
     try:
         amount = float(amount_str)
-        rate_service = RateService()
-        portfolio_service = PortfolioService(rate_service)
+        portfolio_service = _portfolio_service()
         result = portfolio_service.buy_currency(
             current_user.user_id, currency_code, amount
         )
@@ -81,7 +115,10 @@ def handle_buy(currency_code, amount_str):
             f"{format_currency(result['new_balance'], currency_code)}"
         )
         print(f"   Остаток USD: {format_currency(usd_balance, 'USD')}")
-    except (InsufficientFundsError, CurrencyNotFoundError, ApiRequestError) as e:
+    except CurrencyNotFoundError as e:
+        print(f" Ошибка покупки: {e}")
+        print(f"   Поддерживаемые валюты: {get_all_currency_codes_str()}")
+    except (InsufficientFundsError, ApiRequestError) as e:
         print(f" Ошибка покупки: {e}")
     except ValueError as e:
         if "could not convert" in str(e).lower():
@@ -98,8 +135,7 @@ def handle_sell(target_currency, amount_str):
     """
     try:
         amount_in_target = float(amount_str)
-        rate_service = RateService()
-        portfolio_service = PortfolioService(rate_service)
+        portfolio_service = _portfolio_service()
         result = portfolio_service.sell_currency(
             current_user.user_id, target_currency, amount_in_target
         )
@@ -119,7 +155,10 @@ def handle_sell(target_currency, amount_str):
         print(f"   - {asset_sold}: было {old_balance_str} → стало {new_balance_str}")
         print(f"   Оценочная выручка: {proceeds_str}")
 
-    except (InsufficientFundsError, CurrencyNotFoundError, ValueError) as e:
+    except CurrencyNotFoundError as e:
+        print(f" Ошибка продажи: {e}")
+        print(f"   Поддерживаемые валюты: {get_all_currency_codes_str()}")
+    except (InsufficientFundsError, ValueError) as e:
         print(f" Ошибка продажи: {e}")
     except Exception as e:
         print(f" Непредвиденная ошибка: {e}")
@@ -128,8 +167,8 @@ def handle_sell(target_currency, amount_str):
 def handle_show_portfolio(base_currency="USD"):
     """Обработчик команды show-portfolio."""
     try:
-        rate_service = RateService()
-        portfolio_service = PortfolioService(rate_service)
+        rate_service = _rate_service()
+        portfolio_service = _portfolio_service()
         portfolio = portfolio_service.get_portfolio(current_user.user_id)
         wallets = portfolio.get_all_wallets()
 
@@ -137,32 +176,39 @@ def handle_show_portfolio(base_currency="USD"):
             print(f"Портфель пользователя '{current_user.username}' пуст.")
             return
 
-        print(
+        needed = [(w.currency_code, base_currency) for w in wallets]
+        rates = rate_service.get_rates(needed)
+
+        # Сначала считаем стоимости (чистая арифметика), затем форматируем вывод
+        values = {}
+        for wallet in wallets:
+            rate_data = rates.get((wallet.currency_code, base_currency))
+            if rate_data is not None:
+                values[wallet.currency_code] = wallet.balance * rate_data.rate
+        total_value = sum(values.values())
+
+        out = [
             f" Портфель пользователя '{current_user.username}' "
             f"(база: {base_currency}):"
-        )
-        total_value = 0.0
-        for wallet in sorted(wallets, key=lambda w: w.currency_code):
+        ]
+        for wallet in sorted(wallets, key=attrgetter("currency_code")):
             balance_str = format_currency(wallet.balance, wallet.currency_code)
-            try:
-                rate_data = rate_service.get_rate(
-                    wallet.currency_code, base_currency
-                )
-                rate = rate_data['rate']
-
-                value_in_base = wallet.balance * rate
-                total_value += value_in_base
-                print(
-                    f"   - {wallet.currency_code}: {balance_str}  → "
-                    f"{format_currency(value_in_base, base_currency)}"
-                )
-            except ValueError:
-                print(
+            value_in_base = values.get(wallet.currency_code)
+            if value_in_base is None:
+                out.append(
                     f"   - {wallet.currency_code}: {balance_str}  → (курс недоступен)"
                 )
+                continue
+            out.append(
+                f"   - {wallet.currency_code}: {balance_str}  → "
+                f"{format_currency(value_in_base, base_currency)}"
+            )
 
-        print("-" * 50)
-        print(f"    Общая стоимость: {format_currency(total_value, base_currency)}")
+        out.append("-" * 50)
+        out.append(
+            f"    Общая стоимость: {format_currency(total_value, base_currency)}"
+        )
+        _emit(out)
     except Exception as e:
         print(f" Ошибка при отображении портфеля: {e}")
 
@@ -171,7 +217,7 @@ def handle_update_rates(source=None):
     """Обработчик команды update-rates."""
     print("  INFO: Starting rates update...")
     try:
-        updater = RatesUpdater()
+        updater = _rates_updater()
         result = updater.update_rates(source=source)
         
         for src, info in result["sources"].items():
@@ -194,56 +240,84 @@ def handle_update_rates(source=None):
         print(f" ERROR: A critical error occurred: {e}")
 
 
+def handle_schedule_updates(interval=None):
+    """Обработчик команды schedule-updates: запускает фоновое обновление курсов."""
+    global _schedule_stop
+    if _schedule_stop is not None:
+        print("  INFO: Обновление по расписанию уже запущено.")
+        return
+    updater = _rates_updater()
+    if interval is None:
+        interval = updater.config.UPDATE_INTERVAL_SECONDS
+    _schedule_stop = updater.start_background(interval)
+    print(
+        f"  INFO: Курсы обновляются в фоне каждые {interval} с. "
+        "Результаты пишутся в logs/actions.log. stop-updates — остановить."
+    )
+
+
+def handle_stop_updates():
+    """Обработчик команды stop-updates: останавливает фоновое обновление."""
+    global _schedule_stop
+    if _schedule_stop is None:
+        print("  INFO: Обновление по расписанию не запущено.")
+        return
+    _schedule_stop.set()
+    _schedule_stop = None
+    print("  INFO: Обновление по расписанию остановлено.")
+
+
 def handle_show_rates(currency=None, top=None, base=None):
     """Обработчик команды show-rates."""
     try:
-        updater = RatesUpdater()
+        updater = _rates_updater()
         cache = updater.get_current_rates()
-        pairs = {
-            k: v for k, v in cache.items()
-            if k not in {"source", "last_refresh"} and isinstance(v, dict)
-        }
-        
-        if not pairs:
-            print("  Локальный кеш курсов пуст. Выполните 'update-rates'.")
-            return
-            
+        base_u = base.upper() if base else None
+        currency_u = currency.upper() if currency else None
+
+        # Один проход по кешу: служебные ключи пропускаем, фильтры применяем сразу
+        has_pairs = False
         filtered = []
-        for k, data in pairs.items():
-            f, t = k.split("_")
-            if (base and t.upper() != base.upper()) or \
-               (currency and f.upper() != currency.upper()):
+        for k, data in cache.items():
+            if k in _CACHE_META_KEYS or not isinstance(data, dict):
+                continue
+            has_pairs = True
+            f, _, t = k.partition("_")
+            if (base_u and t != base_u) or (currency_u and f != currency_u):
                 continue
             filtered.append((k, data["rate"]))
-            
+
+        if not has_pairs:
+            print("  Локальный кеш курсов пуст. Выполните 'update-rates'.")
+            return
+
         if not filtered:
             print(f"  Курс для '{(currency or base).upper()}' не найден.")
             return
 
-        filtered.sort(key=lambda item: item[1] if top else item[0], reverse=bool(top))
+        filtered.sort(key=itemgetter(1 if top else 0), reverse=bool(top))
         if top:
             filtered = filtered[:top]
             
-        print(f" Rates from cache (updated at {cache.get('last_refresh')}):")
-        for pair, rate in filtered:
-            print(f"   - {pair}: {rate}")
+        out = [f" Rates from cache (updated at {cache.get('last_refresh')}):"]
+        out.extend(f"   - {pair}: {rate}" for pair, rate in filtered)
+        _emit(out)
     except Exception as e:
         print(f" ERROR: An error occurred: {e}")
 
 def handle_get_rate(from_currency, to_currency):
     """Обработчик для команды get-rate."""
     try:
-        rate_service = RateService()
+        rate_service = _rate_service()
         result = rate_service.get_rate(from_currency, to_currency)
-        rate = result["rate"]
-        timestamp = result["timestamp"]
+        rate, timestamp = result
 
         # --- ОТЛАДКА ---
         #print(f"DEBUG interface: timestamp received: {timestamp}")
         #print(f"DEBUG interface: type of timestamp: {type(timestamp)}")
 
-        reverse_result = rate_service.get_rate(to_currency, from_currency)
-        reverse_rate = reverse_result["rate"]
+        # Обратный курс — просто обратная величина, второй запрос не нужен
+        reverse_rate = 1.0 / rate if rate else 0.0
 
         time_str = str(timestamp) # <-- Упрощаем до простого вывода строки
 
@@ -261,52 +335,135 @@ def handle_get_rate(from_currency, to_currency):
         print(f" Непредвиденная ошибка: {e}")
 
 
+def handle_export(dest_dir="export"):
+    """Обработчик команды export: сохраняет читаемую копию данных."""
+    from ..infra.database import DatabaseManager
+    try:
+        written = DatabaseManager().export_pretty(dest_dir)
+    except Exception as e:
+        print(f" Ошибка экспорта данных: {e}")
+        return
+    print(f" Данные экспортированы в '{dest_dir}':")
+    for path in written:
+        print(f"   - {path.name}")
+
+
+def _flag_value(args, flag):
+    """Возвращает значение, следующее за флагом (например, '--amount')."""
+    return args[args.index(flag) + 1]
+
+
+def _require_login():
+    """Проверяет, что пользователь вошел в систему."""
+    if not current_user:
+        print(" Ошибка: для этой команды требуется аутентификация. "
+              "Используйте 'login'.")
+        return False
+    return True
+
+
+def _cmd_register(args):
+    handle_register(_flag_value(args, "--username"), _flag_value(args, "--password"))
+
+
+def _cmd_login(args):
+    handle_login(_flag_value(args, "--username"), _flag_value(args, "--password"))
+
+
+def _cmd_buy(args):
+    if _require_login():
+        handle_buy(_flag_value(args, "--currency"), _flag_value(args, "--amount"))
+
+
+def _cmd_sell(args):
+    if _require_login():
+        handle_sell(_flag_value(args, "--currency"), _flag_value(args, "--amount"))
+
+
+def _cmd_show_portfolio(args):
+    if _require_login():
+        base = "USD"
+        if len(args) > 1 and args[1] == "--base":
+            base = args[2].upper()
+        handle_show_portfolio(base)
+
+
+def _cmd_update_rates(args):
+    source = None
+    if len(args) > 1 and args[1] == "--source":
+        source = args[2].lower()
+    handle_update_rates(source)
+
+
+def _cmd_schedule_updates(args):
+    interval = None
+    if len(args) > 1 and args[1] == "--interval":
+        interval = int(args[2])
+        if interval <= 0:
+            raise ValueError("интервал должен быть положительным")
+    handle_schedule_updates(interval)
+
+
+def _cmd_stop_updates(args):
+    handle_stop_updates()
+
+
+def _cmd_show_rates(args):
+    params = {}
+    i = 1
+    while i + 1 < len(args):
+        flag = args[i].lstrip("-")
+        value = args[i + 1]
+        params[flag] = int(value) if flag == "top" else value
+        i += 2
+    if i < len(args):
+        raise ValueError(f"для флага '{args[i]}' не указано значение")
+    handle_show_rates(**params)
+
+
+def _cmd_get_rate(args):
+    handle_get_rate(_flag_value(args, "--from"), _flag_value(args, "--to"))
+
+
+def _cmd_export(args):
+    dest_dir = "export"
+    if len(args) > 1 and args[1] == "--dir":
+        dest_dir = args[2]
+    handle_export(dest_dir)
+
+
+def _cmd_exit(args):
+    return "exit"
+
+
+# Таблица команд: имя команды -> обработчик, разбирающий свои аргументы
+_DISPATCH = {
+    "register": _cmd_register,
+    "login": _cmd_login,
+    "buy": _cmd_buy,
+    "sell": _cmd_sell,
+    "show-portfolio": _cmd_show_portfolio,
+    "update-rates": _cmd_update_rates,
+    "schedule-updates": _cmd_schedule_updates,
+    "stop-updates": _cmd_stop_updates,
+    "show-rates": _cmd_show_rates,
+    "get-rate": _cmd_get_rate,
+    "export": _cmd_export,
+    "exit": _cmd_exit,
+}
+
+
 def process_command(args):
     """Новая функция для обработки одной команды."""
-    global current_user
     if not args:
         return
     command = args[0]
+    handler = _DISPATCH.get(command)
+    if handler is None:
+        print(f" Неизвестная команда: {command}")
+        return
     try:
-        if command == "register":
-            handle_register(args[2], args[4])
-        elif command == "login":
-            handle_login(args[2], args[4])
-        elif command in ["buy", "sell", "show-portfolio"]:
-            if not current_user:
-                print(" Ошибка: для этой команды требуется аутентификация. "
-                      "Используйте 'login'.")
-                return
-            if command == "buy":
-                handle_buy(args[2], args[4])
-            elif command == "sell":
-                handle_sell(args[2], args[4])
-            elif command == "show-portfolio":
-                base = "USD"
-                if len(args) > 1 and args[1] == "--base":
-                    base = args[2].upper()
-                handle_show_portfolio(base)
-        elif command == "update-rates":
-            source = None
-            if len(args) > 1 and args[1] == "--source":
-                source = args[2].lower()
-            handle_update_rates(source)
-        elif command == "show-rates":
-            params = {
-                args[i].lstrip("-"): (
-                    int(args[i + 1]) if args[i] == "--top" else args[i + 1]
-                )
-                for i in range(1, len(args), 2)
-            }
-            handle_show_rates(**params)
-        elif command == "get-rate":
-            handle_get_rate(
-                args[args.index("--from") + 1], args[args.index("--to") + 1]
-            )
-        elif command == "exit":
-            return "exit"
-        else:
-            print(f" Неизвестная команда: {command}")
+        return handler(args)
     except (IndexError, ValueError) as e:
         print(f" Ошибка в аргументах команды '{command}': {e}. Используйте 'help'.")
 
@@ -321,17 +478,31 @@ def main():
         log_file=settings.get("LOG_FILE", "logs/actions.log"),
         log_level=settings.get("LOG_LEVEL", "INFO"),
     )
+
+    # Прогреваем кеш основных сервисов до входа в цикл;
+    # RatesUpdater создается только по требованию (update-rates/show-rates)
+    _auth_service()
+    _portfolio_service()
     
     print(" Добро пожаловать в ValutaTrade Hub!")
     print(" Введите 'exit', чтобы выйти.")
-    
+
+    # Локальные ссылки: в цикле обращение к ним дешевле, чем к глобальным именам
+    read_line = input
+    shlex_split = shlex.split
+    process = process_command
+
     while True:
         try:
-            line = input("> ")
+            line = read_line("> ")
             if not line:
                 continue
-            args = shlex.split(line)
-            if process_command(args) == "exit":
+            # shlex нужен только для строк с кавычками
+            if '"' in line or "'" in line:
+                args = shlex_split(line)
+            else:
+                args = line.split()
+            if process(args) == "exit":
                 break
         except KeyboardInterrupt:
             print("\nВыход из приложения.")
@@ -339,6 +510,10 @@ def main():
         except Exception as e:
             print(f"Критическая ошибка: {e}")
 
+    # Фоновый поток обновления курсов не должен пережить сессию
+    if _schedule_stop is not None:
+        _schedule_stop.set()
+
 
 if __name__ == "__main__":
     main()
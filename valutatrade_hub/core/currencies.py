@@ -1,30 +1,43 @@
 """
 Иерархия классов для валют и реестр для их получения.
 """
-from abc import ABC, abstractmethod
 from typing import Dict
 
 from .exceptions import CurrencyNotFoundError
 
 
-class Currency(ABC):
-    """Абстрактный базовый класс для всех валют."""
+class Currency:
+    """
+    Базовый класс для всех валют.
+
+    Наследники обязаны переопределить get_display_info().
+    """
+    __slots__ = ("name", "code")
+
     def __init__(self, name: str, code: str):
-        if not name or not isinstance(name, str):
-            raise ValueError("Имя валюты не может быть пустым.")
-        if not (isinstance(code, str) and 2 <= len(code) <= 5 and code.isupper()):
-            raise ValueError("Код валюты должен быть строкой 2-5 заглавных букв.")
-        
+        # Реестр собирается вручную, поэтому проверки нужны только при разработке:
+        # при запуске с `python -O` блок __debug__ удаляется компилятором.
+        if __debug__:
+            if not name or not isinstance(name, str):
+                raise ValueError("Имя валюты не может быть пустым.")
+            if not (
+                isinstance(code, str) and 2 <= len(code) <= 5 and code.isupper()
+            ):
+                raise ValueError(
+                    "Код валюты должен быть строкой 2-5 заглавных букв."
+                )
+
         self.name = name
         self.code = code
 
-    @abstractmethod
     def get_display_info(self) -> str:
         """Возвращает строковое представление для UI/логов."""
-        pass
+        raise NotImplementedError
 
 class FiatCurrency(Currency):
     """Представляет фиатную валюту."""
+    __slots__ = ("issuing_country",)
+
     def __init__(self, name: str, code: str, issuing_country: str):
         super().__init__(name, code)
         self.issuing_country = issuing_country
@@ -37,6 +50,8 @@ class FiatCurrency(Currency):
 
 class CryptoCurrency(Currency):
     """Представляет криптовалюту."""
+    __slots__ = ("algorithm", "market_cap")
+
     def __init__(self, name: str, code: str, algorithm: str, market_cap: float):
         super().__init__(name, code)
         self.algorithm = algorithm
@@ -65,6 +80,13 @@ _CURRENCY_REGISTRY: Dict[str, Currency] = {
     "ETH": CryptoCurrency("Ethereum", "ETH", "Ethash", 3.6e11),
 }
 
+# Набор кодов не меняется после загрузки модуля, поэтому строим его один раз
+_ALL_CURRENCY_CODES: tuple[str, ...] = tuple(_CURRENCY_REGISTRY.keys())
+_ALL_CURRENCY_CODES_STR: str = ", ".join(_ALL_CURRENCY_CODES)
+
+# Множество допустимых кодов для быстрой проверки без обращения к фабрике
+VALID_CODES: frozenset[str] = frozenset(_CURRENCY_REGISTRY)
+
 def get_currency(code: str) -> Currency:
     """
     Фабричная функция для получения экземпляра валюты по ее коду.
@@ -73,11 +95,15 @@ def get_currency(code: str) -> Currency:
         CurrencyNotFoundError: Если код валюты не найден в реестре.
     """
     currency = _CURRENCY_REGISTRY.get(code.upper())
-    if not currency:
+    if currency is None:
         raise CurrencyNotFoundError(code)
     return currency
 
-def get_all_currency_codes() -> list[str]:
-    """Возвращает список всех поддерживаемых кодов валют."""
-    return list(_CURRENCY_REGISTRY.keys())
+def get_all_currency_codes() -> tuple[str, ...]:
+    """Возвращает кортеж всех поддерживаемых кодов валют."""
+    return _ALL_CURRENCY_CODES
+
+def get_all_currency_codes_str() -> str:
+    """Возвращает коды валют одной строкой через запятую (для подсказок в UI)."""
+    return _ALL_CURRENCY_CODES_STR
 
@@ -3,20 +3,35 @@
 """
 
 
+# Шаблон сообщения хранится на уровне модуля и форматируется через %
+_INSUFFICIENT_FUNDS_MSG = (
+    "Недостаточно средств: доступно %.4f %s, требуется %.4f %s"
+)
+
+
 class BaseWalletException(Exception):
     """Базовое исключение для всех ошибок приложения."""
     pass
 
 
 class InsufficientFundsError(BaseWalletException):
-    """Выбрасывается при недостатке средств на кошельке."""
+    """
+    Выбрасывается при недостатке средств на кошельке.
+
+    Текст сообщения формируется только при вызове str().
+    """
+
     def __init__(self, available: float, required: float, code: str):
         self.available = available
         self.required = required
         self.code = code
-        super().__init__(
-            f"Недостаточно средств: доступно {available:.4f} {code}, "
-            f"требуется {required:.4f} {code}"
+        # В args — исходные поля: repr остается информативным,
+        # а строка сообщения по-прежнему собирается лениво
+        super().__init__(available, required, code)
+
+    def __str__(self) -> str:
+        return _INSUFFICIENT_FUNDS_MSG % (
+            self.available, self.code, self.required, self.code
         )
 
 
@@ -33,7 +48,10 @@ class ApiRequestError(BaseWalletException):
     """
     Исключение для ошибок при запросе к внешним API.
     Наследуется от BaseWalletException для единой иерархии.
+
+    Полное сообщение (свойство message) собирается только по запросу.
     """
+
     def __init__(
         self,
         service_name: str,
@@ -42,10 +60,18 @@ class ApiRequestError(BaseWalletException):
     ):
         self.service_name = service_name
         self.status_code = status_code
-        self.message = f"[{service_name}] {message}"
-        if status_code:
-            self.message += f" (Status: {status_code})"
-        super().__init__(self.message)
+        self.detail = message
+        super().__init__(service_name, status_code, message)
+
+    @property
+    def message(self) -> str:
+        message = f"[{self.service_name}] {self.detail}"
+        if self.status_code:
+            message += f" (Status: {self.status_code})"
+        return message
+
+    def __str__(self) -> str:
+        return self.message
 
 
 class RateLimitError(ApiRequestError):
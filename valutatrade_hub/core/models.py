@@ -5,9 +5,19 @@
 
 
 import hashlib
+import hmac
 import secrets
 from datetime import datetime
-from typing import Dict, List, Optional
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple
+
+# Параметры scrypt, записанные в хеше: (log_n, r, p)
+_ScryptParams = Tuple[int, int, int]
+
+# Параметры scrypt для новых паролей: n = 2**14, r = 8, p = 1
+_SCRYPT_LOG_N = 14
+_SCRYPT_R = 8
+_SCRYPT_P = 1
 
 
 class User:
@@ -17,11 +27,22 @@ class User:
     Attributes:
         _user_id: Уникальный идентификатор пользователя
         _username: Имя пользователя
-        _hashed_password: Хешированный пароль
-        _salt: Соль для хеширования пароля
+        _hashed_password: Хеш пароля (сырые байты дайджеста)
+        _hash_params: Параметры scrypt (log_n, r, p) или None для SHA-256
+        _salt: Соль для хеширования пароля (сырые байты)
         _registration_date: Дата регистрации пользователя
     """
 
+    __slots__ = (
+        "_user_id",
+        "_username",
+        "_hashed_password",
+        "_hash_params",
+        "_salt",
+        "_registration_date",
+        "_registration_date_iso",
+    )
+
     def __init__(
         self,
         user_id: int,
@@ -54,18 +75,48 @@ class User:
         self._user_id = user_id
         self._username = username.strip()
         self._registration_date = registration_date or datetime.now()
+        # Дата регистрации неизменна, поэтому ISO-строку формируем один раз
+        self._registration_date_iso = self._registration_date.isoformat()
 
+        # Соль и хеш храним в байтах; hex используется только в JSON
         if hashed_password and salt:
-            self._salt = salt
-            self._hashed_password = hashed_password
+            self._salt = bytes.fromhex(salt)
+            self._hash_params, self._hashed_password = self._parse_hash(
+                hashed_password
+            )
         else:
-            self._salt = salt or secrets.token_hex(8)
-            self._hashed_password = self._hash_password(password, self._salt)
+            self._salt = bytes.fromhex(salt) if salt else secrets.token_bytes(8)
+            self._set_password(password)
+
+    def _set_password(self, password: str) -> None:
+        """Хеширует пароль текущими параметрами scrypt."""
+        self._hash_params = (_SCRYPT_LOG_N, _SCRYPT_R, _SCRYPT_P)
+        self._hashed_password = self._scrypt(password, self._salt, *self._hash_params)
+
+    @staticmethod
+    def _parse_hash(hashed_password: str) -> Tuple[Optional[_ScryptParams], bytes]:
+        """
+        Разбирает сохраненный хеш на параметры и сырой дайджест.
+
+        Формат 'scrypt$14$8$1$<hex>' дает параметры scrypt,
+        строка без префикса считается старым хешем SHA-256.
+        """
+        if hashed_password.startswith("scrypt$"):
+            _, log_n, r, p, digest = hashed_password.split("$")
+            return (int(log_n), int(r), int(p)), bytes.fromhex(digest)
+        return None, bytes.fromhex(hashed_password)
 
     @staticmethod
-    def _hash_password(password: str, salt: str) -> str:
-        """Хеширует пароль с использованием соли."""
-        return hashlib.sha256((password + salt).encode()).hexdigest()
+    def _scrypt(password: str, salt: bytes, log_n: int, r: int, p: int) -> bytes:
+        return hashlib.scrypt(
+            password.encode(), salt=salt, n=2 ** log_n, r=r, p=p, dklen=32
+        )
+
+    @staticmethod
+    def _hash_password_legacy(password: str, salt: bytes) -> bytes:
+        """Старый формат хеша (SHA-256), сохранен для проверки существующих записей."""
+        # В старом формате к паролю приписывалась hex-строка соли
+        return hashlib.sha256((password + salt.hex()).encode()).digest()
 
     @property
     def user_id(self) -> int:
@@ -80,7 +131,7 @@ class User:
         # Это свойство нужно для обратной совместимости с usecases.py
         # В идеале, его нужно будет удалить и везде использовать verify_password
         # Но для быстрого исправления - это лучший вариант.
-        return self._hashed_password
+        return self.hashed_password
 
     @property
     def registration_date(self) -> datetime:
@@ -88,11 +139,14 @@ class User:
 
     @property
     def salt(self) -> str:
-        return self._salt
+        return self._salt.hex()
 
     @property
     def hashed_password(self) -> str:
-        return self._hashed_password
+        if self._hash_params is None:
+            return self._hashed_password.hex()
+        log_n, r, p = self._hash_params
+        return f"scrypt${log_n}${r}${p}${self._hashed_password.hex()}"
 
     @username.setter
     def username(self, value: str) -> None:
@@ -105,41 +159,53 @@ class User:
         return {
             "user_id": self._user_id,
             "username": self._username,
-            "registration_date": self._registration_date.isoformat(),
+            "registration_date": self._registration_date_iso,
         }
 
     def change_password(self, new_password: str) -> None:
         """Изменяет пароль пользователя."""
         if len(new_password) < 4:
             raise ValueError("Новый пароль должен быть не короче 4 символов")
-        self._salt = secrets.token_hex(8)
-        self._hashed_password = self._hash_password(new_password, self._salt)
+        self._salt = secrets.token_bytes(8)
+        self._set_password(new_password)
 
     def verify_password(self, password: str) -> bool:
         """Проверяет введённый пароль на совпадение."""
-        return self._hash_password(password, self._salt) == self._hashed_password
+        if self._hash_params is not None:
+            candidate = self._scrypt(password, self._salt, *self._hash_params)
+        else:
+            candidate = self._hash_password_legacy(password, self._salt)
+        # Сравнение за постоянное время, без утечки через тайминг
+        return hmac.compare_digest(candidate, self._hashed_password)
 
     def to_dict(self) -> dict:
         """Сериализует объект User в словарь для сохранения в JSON."""
         return {
             "user_id": self._user_id,
             "username": self._username,
-            "salt": self._salt,
-            "hashed_password": self._hashed_password,
-            "registration_date": self._registration_date.isoformat(),
+            "salt": self._salt.hex(),
+            "hashed_password": self.hashed_password,
+            "registration_date": self._registration_date_iso,
         }
 
     @classmethod
     def from_dict(cls, data: dict) -> 'User':
-        """Создает объект User из словаря (десериализация из JSON)."""
-        return cls(
-            user_id=data["user_id"],
-            username=data["username"],
-            password="",
-            salt=data["salt"],
-            hashed_password=data["hashed_password"],
-            registration_date=datetime.fromisoformat(data["registration_date"]),
+        """
+        Создает объект User из словаря (десериализация из JSON).
+
+        Конструктор не вызывается: сохраненный хеш и соль переносятся
+        как есть, без проверок пароля и без повторного хеширования.
+        """
+        user = cls.__new__(cls)
+        user._user_id = data["user_id"]
+        user._username = data["username"]
+        user._salt = bytes.fromhex(data["salt"])
+        user._hash_params, user._hashed_password = cls._parse_hash(
+            data["hashed_password"]
         )
+        user._registration_date_iso = data["registration_date"]
+        user._registration_date = datetime.fromisoformat(user._registration_date_iso)
+        return user
 
     def __repr__(self):
         return f"User(id={self._user_id}, username='{self._username}')"
@@ -148,6 +214,8 @@ class User:
 class Wallet:
     """Представляет кошелёк для одной валюты."""
 
+    __slots__ = ("currency_code", "_balance")
+
     def __init__(self, currency_code: str, balance: float = 0.0):
         """
         Инициализирует кошелек с указанной валютой.
@@ -188,7 +256,13 @@ class Wallet:
         Raises:
             ValueError: Если сумма не положительная
         """
-        if not isinstance(amount, (int, float)) or amount <= 0:
+        # Проверка типа нужна только при разработке (снимается при `python -O`):
+        # сервисный слой передает сюда уже проверенные числа
+        if __debug__ and not isinstance(amount, (int, float)):
+            raise ValueError(
+                "Сумма пополнения должна быть положительным числом"
+            )
+        if amount <= 0:
             raise ValueError(
                 "Сумма пополнения должна быть положительным числом"
             )
@@ -204,7 +278,9 @@ class Wallet:
         Raises:
             ValueError: Если сумма не положительная или превышает баланс
         """
-        if not isinstance(amount, (int, float)) or amount <= 0:
+        if __debug__ and not isinstance(amount, (int, float)):
+            raise ValueError("Сумма снятия должна быть положительным числом")
+        if amount <= 0:
             raise ValueError("Сумма снятия должна быть положительным числом")
         if amount > self._balance:
             raise ValueError(
@@ -252,6 +328,8 @@ class Wallet:
 class Portfolio:
     """Представляет портфель пользователя (все его кошельки)."""
 
+    __slots__ = ("_user_id", "_wallets")
+
     # Фиксированные курсы для упрощения
     EXCHANGE_RATES = {
         "USD": 1.0,
@@ -282,9 +360,14 @@ class Portfolio:
         return self._user_id
 
     @property
-    def wallets(self) -> Dict[str, Wallet]:
-        """Возвращает копию словаря кошельков."""
-        return self._wallets.copy()
+    def wallets(self) -> Mapping[str, Wallet]:
+        """
+        Возвращает словарь кошельков только для чтения.
+
+        Это представление без копирования: изменения портфеля сразу видны в нем,
+        а изменить сам словарь через него нельзя.
+        """
+        return MappingProxyType(self._wallets)
 
     def add_currency(self, currency_code: str) -> Wallet:
         """
@@ -317,17 +400,17 @@ class Portfolio:
         if base_code not in self.EXCHANGE_RATES:
             raise ValueError(f"Неизвестная базовая валюта: {base_code}")
 
-        total_value = 0.0
-        base_rate = self.EXCHANGE_RATES[base_code]
-
-        for wallet in self._wallets.values():
-            if wallet.currency_code in self.EXCHANGE_RATES:
-                # Конвертируем баланс в USD, затем в базовую валюту
-                usd_value = (
-                    wallet.balance * self.EXCHANGE_RATES[wallet.currency_code]
-                )
-                total_value += usd_value / base_rate
-        return round(total_value, 2)
+        rates = self.EXCHANGE_RATES
+        # Сумма пересчитывается при каждом вызове (кошельков не больше пяти):
+        # накопленная сумма приращений float за время жизни кешированного
+        # портфеля могла бы разойтись со свежей суммой на копейку.
+        # Делим на курс базы один раз.
+        usd_total = sum(
+            wallet.balance * rates[code]
+            for code, wallet in self._wallets.items()
+            if code in rates
+        )
+        return round(usd_total / rates[base_code], 2)
 
     # --- Методы сериализации для JSON ---
     def to_dict(self) -> dict:
@@ -3,9 +3,10 @@
 Содержит сервисы для управления пользователями, портфелями и курсами.
 """
 from datetime import datetime
+from typing import Dict, List, NamedTuple, Tuple
 
-from ..core.currencies import get_currency
-from ..core.exceptions import InsufficientFundsError
+from ..core.currencies import VALID_CODES
+from ..core.exceptions import CurrencyNotFoundError, InsufficientFundsError
 from ..core.models import Portfolio, User
 from ..core.utils import validate_amount
 from ..decorators import log_action
@@ -13,6 +14,21 @@ from ..infra.database import DatabaseManager
 from ..infra.settings import SettingsLoader
 
 
+class RateResult(NamedTuple):
+    """Курс обмена и временная метка его последнего обновления."""
+
+    rate: float
+    timestamp: str
+
+
+def _require_known_code(code: str) -> str:
+    """Приводит код к верхнему регистру и проверяет, что валюта поддерживается."""
+    code_upper = code.upper()
+    if code_upper not in VALID_CODES:
+        raise CurrencyNotFoundError(code)
+    return code_upper
+
+
 class AuthService:
     """Сервис для аутентификации и регистрации пользователей."""
 
@@ -21,27 +37,22 @@ class AuthService:
 
     def find_user_by_username(self, username: str) -> User | None:
         """Вспомогательный метод для поиска пользователя по имени."""
-        users = self.db.get_users()
-        return next((u for u in users if u.username == username), None)
+        return self.db.get_user_by_username(username)
 
     @log_action(action_type="REGISTER", verbose=True)
     def register(self, username: str, password: str) -> User:
         """Регистрирует нового пользователя."""
-        if self.find_user_by_username(username):
+        if self.db.get_user_by_username(username) is not None:
             raise ValueError(f"Имя пользователя '{username}' уже занято")
-        users = self.db.get_users()
-        new_user_id = max([u.user_id for u in users] or [0]) + 1
+        new_user_id = self.db.allocate_user_id()
         new_user = User(
             user_id=new_user_id, username=username, password=password
         )
-        users.append(new_user)
-        self.db.save_users(users)
-        portfolios = self.db.get_portfolios()
+        self.db.append_user(new_user)
         new_portfolio = Portfolio(user_id=new_user_id)
         new_portfolio.add_currency("USD")
         new_portfolio.get_wallet("USD").deposit(10000)
-        portfolios.append(new_portfolio)
-        self.db.save_portfolios(portfolios)
+        self.db.save_portfolio(new_portfolio)
         return new_user
 
     @log_action(action_type="LOGIN", verbose=True)
@@ -68,66 +79,156 @@ class RateService:
     def __init__(self):
         self.db = DatabaseManager()
         self.settings = SettingsLoader()
+        # Таблица курсов (from, to) -> rate, построенная по файлу курсов,
+        # его mtime и временная метка последнего обновления
+        self._rate_table: Dict[Tuple[str, str], float] | None = None
+        self._rates_mtime: int | None = None
+        self._rates_timestamp = "N/A"
+        # Курсы CODE→USD, из которых считаются кросс-курсы
+        self._usd_table: Dict[str, float] = {}
+
+    def _current_table(self) -> Dict[Tuple[str, str], float]:
+        """Возвращает таблицу курсов, перестраивая ее только при изменении файла."""
+        mtime = self.db.get_rates_mtime()
+        if self._rate_table is None or mtime != self._rates_mtime:
+            rates_data = self.db.get_rates() or self.FALLBACK_RATES
+            pair_rates = self._parse_pair_rates(rates_data)
+            self._usd_table = self._build_usd_table(pair_rates)
+            self._rate_table = self._build_rate_table(pair_rates, self._usd_table)
+            self._rates_mtime = mtime
+            # В FALLBACK_RATES метки обновления нет — это штатный случай
+            self._rates_timestamp = rates_data.get("last_refresh", "N/A")
+        return self._rate_table
+
+    @staticmethod
+    def _parse_pair_rates(rates_data: dict) -> Dict[Tuple[str, str], float]:
+        """
+        Переводит записи вида 'FROM_TO': {"rate": ...} в словарь (FROM, TO) -> rate.
+
+        Строковые ключи разбираются один раз при загрузке; дальше все
+        поиски идут по кортежам без сборки строк. Служебные поля
+        (source, last_refresh) и записи без курса пропускаются.
+        """
+        pair_rates = {}
+        for key, pair in rates_data.items():
+            if not isinstance(pair, dict) or pair.get("rate") is None:
+                continue
+            from_code, _, to_code = key.partition("_")
+            if to_code:
+                pair_rates[(from_code, to_code)] = pair["rate"]
+        return pair_rates
+
+    @staticmethod
+    def _build_usd_table(
+        pair_rates: Dict[Tuple[str, str], float]
+    ) -> Dict[str, float]:
+        """
+        Собирает курсы CODE→USD за один проход по парам X_USD и USD_X.
+
+        Прямая пара X_USD имеет приоритет над обратной USD_X.
+        """
+        usd_table = {"USD": 1.0}
+        reverse = {}
+        for (from_code, to_code), rate in pair_rates.items():
+            if not rate:
+                continue
+            if to_code == "USD":
+                usd_table[from_code] = rate
+            elif from_code == "USD":
+                reverse[to_code] = 1 / rate
+        for code, rate in reverse.items():
+            usd_table.setdefault(code, rate)
+        return usd_table
+
+    @staticmethod
+    def _build_rate_table(
+        pair_rates: Dict[Tuple[str, str], float], usd_table: Dict[str, float]
+    ) -> Dict[Tuple[str, str], float]:
+        """
+        Строит таблицу курсов для всех пар поддерживаемых валют за один проход.
+
+        Для каждой пары берется прямой курс, затем обратный, а если ни одна
+        из валют не USD — кросс-курс как частное курсов к USD. Недоступные
+        пары в таблицу не попадают.
+        """
+        table = {}
+        for from_code in VALID_CODES:
+            for to_code in VALID_CODES:
+                if from_code == to_code:
+                    continue
+                rate = pair_rates.get((from_code, to_code))
+                if rate is None:
+                    reverse = pair_rates.get((to_code, from_code))
+                    if reverse:
+                        rate = 1 / reverse
+                    elif (
+                        from_code in usd_table
+                        and to_code in usd_table
+                        and "USD" not in (from_code, to_code)
+                    ):
+                        rate = usd_table[from_code] / usd_table[to_code]
+                if rate is not None:
+                    table[(from_code, to_code)] = rate
+        return table
+
+    def get_rate(self, from_currency: str, to_currency: str) -> RateResult:
+        """Получает курс обмена и временную метку из таблицы курсов."""
+        return self.get_rate_normalized(
+            _require_known_code(from_currency), _require_known_code(to_currency)
+        )
 
-    def get_rate(
-        self, from_currency: str, to_currency: str, depth: int = 0
-    ) -> dict:
-        """Получает курс обмена и временную метку, читая файл каждый раз."""
-        rates_data = self.db.get_rates() or self.FALLBACK_RATES
+    def get_rate_normalized(
+        self, from_currency: str, to_currency: str
+    ) -> RateResult:
+        """
+        Как get_rate, но для уже проверенных кодов в верхнем регистре.
 
-        # ---> PRINT ДЛЯ ОТЛАДКИ <---
-        #print(f"DEBUG: rates_data in get_rate (depth={depth}): {rates_data}")
+        Повторной проверки кодов не делает: предназначен для сервисов,
+        которые уже нормализовали коды (например, PortfolioService).
 
-        if depth > 2:
-            msg = f"Превышена глубина рекурсии для {from_currency}→{to_currency}"
-            raise ValueError(msg)
+        Args:
+            from_currency: Известный код исходной валюты (верхний регистр)
+            to_currency: Известный код целевой валюты (верхний регистр)
 
-        from_currency, to_currency = from_currency.upper(), to_currency.upper()
-        get_currency(from_currency)
-        get_currency(to_currency)
+        Returns:
+            RateResult(rate, timestamp)
 
+        Raises:
+            ValueError: Если курса для пары нет
+        """
         if from_currency == to_currency:
-            return {"rate": 1.0, "timestamp": datetime.now().isoformat()}
-
-        #timestamp = rates_data.get("last_refresh", "N/A")
-        try:
-            timestamp = rates_data["last_refresh"]
-        except KeyError:
-            print("DEBUG: KeyError! Ключ 'last_refresh' НЕ НАЙДЕН.")
-            timestamp = "N/A"
-        pair = f"{from_currency}_{to_currency}"
-        if pair in rates_data and isinstance(rates_data.get(pair), dict):
-            return {"rate": rates_data[pair]["rate"], "timestamp": timestamp}
-
-        reverse_pair = f"{to_currency}_{from_currency}"
-        if reverse_pair in rates_data and isinstance(
-            rates_data.get(reverse_pair), dict
-        ):
-            return {
-                "rate": 1 / rates_data[reverse_pair]["rate"],
-                "timestamp": timestamp,
-            }
-
-        if from_currency != "USD" and to_currency != "USD":
-            try:
-                from_usd = self.get_rate(from_currency, "USD", depth + 1)
-                to_usd = self.get_rate(to_currency, "USD", depth + 1)
-
-                valid_ts = [
-                    ts
-                    for ts in [from_usd["timestamp"], to_usd["timestamp"]]
-                    if ts != "N/A"
-                ]
-                cross_ts = min(valid_ts) if valid_ts else "N/A"
-
-                return {
-                    "rate": from_usd["rate"] / to_usd["rate"],
-                    "timestamp": cross_ts,
-                }
-            except (ValueError, TypeError):
-                pass
-
-        raise ValueError(f"Курс {from_currency}→{to_currency} недоступен")
+            return RateResult(1.0, datetime.now().isoformat())
+
+        rate = self._current_table().get((from_currency, to_currency))
+        if rate is None:
+            raise ValueError(f"Курс {from_currency}→{to_currency} недоступен")
+        return RateResult(rate, self._rates_timestamp)
+
+    def get_rates(
+        self, pairs: List[Tuple[str, str]]
+    ) -> Dict[Tuple[str, str], RateResult]:
+        """
+        Получает курсы для нескольких пар за одно чтение файла курсов.
+
+        Таблица и ее mtime проверяются один раз на весь пакет, повторные
+        пары берутся из уже собранного результата. Недоступные пары
+        в результат не попадают.
+        """
+        table = self._current_table()
+        timestamp = self._rates_timestamp
+        result = {}
+        for pair in pairs:
+            if pair in result:
+                continue
+            from_currency = _require_known_code(pair[0])
+            to_currency = _require_known_code(pair[1])
+            if from_currency == to_currency:
+                result[pair] = RateResult(1.0, datetime.now().isoformat())
+                continue
+            rate = table.get((from_currency, to_currency))
+            if rate is not None:
+                result[pair] = RateResult(rate, timestamp)
+        return result
 
 
 class PortfolioService:
@@ -139,8 +240,7 @@ class PortfolioService:
 
     def get_portfolio(self, user_id: int) -> Portfolio:
         """Находит и возвращает портфель пользователя."""
-        portfolios = self.db.get_portfolios()
-        portfolio = next((p for p in portfolios if p.user_id == user_id), None)
+        portfolio = self.db.get_portfolio(user_id)
         if not portfolio:
             raise ValueError("Портфель для пользователя не найден")
         return portfolio
@@ -151,10 +251,10 @@ class PortfolioService:
         if not validate_amount(amount, min_value=1e-6):
             raise ValueError("Сумма покупки должна быть положительным числом")
 
-        get_currency(currency)
+        currency = _require_known_code(currency)
         portfolio = self.get_portfolio(user_id)
-        rate_data = self.rate_service.get_rate(currency, "USD")
-        rate = rate_data["rate"]
+        rate_data = self.rate_service.get_rate_normalized(currency, "USD")
+        rate = rate_data.rate
         cost_in_usd = amount * rate
         usd_wallet = portfolio.get_wallet("USD")
 
@@ -173,12 +273,7 @@ class PortfolioService:
         old_balance = target_wallet.balance
         target_wallet.deposit(amount)
 
-        portfolios = self.db.get_portfolios()
-        for i, p in enumerate(portfolios):
-            if p.user_id == user_id:
-                portfolios[i] = portfolio
-                break
-        self.db.save_portfolios(portfolios)
+        self.db.save_portfolio(portfolio)
 
         return {
             "currency": currency,
@@ -197,21 +292,22 @@ class PortfolioService:
         if not validate_amount(amount_in_target, min_value=0.01):
             raise ValueError("Сумма продажи должна быть положительным числом")
 
-        get_currency(target_currency)
+        target_currency = _require_known_code(target_currency)
         portfolio = self.get_portfolio(user_id)
 
-        asset_to_sell = None
-        for wallet in portfolio.get_all_wallets():
-            if wallet.currency_code.upper() != target_currency.upper():
-                asset_to_sell = wallet.currency_code
-                break
+        # Ключи кошельков уже в верхнем регистре, как и target_currency
+        asset_to_sell = next(
+            (code for code in portfolio.wallets if code != target_currency), None
+        )
 
         if not asset_to_sell:
             raise ValueError("В портфеле нет активов для продажи.")
 
         target_wallet = portfolio.get_wallet(asset_to_sell)
-        rate_data = self.rate_service.get_rate(asset_to_sell, target_currency)
-        rate = rate_data["rate"]
+        rate_data = self.rate_service.get_rate_normalized(
+            asset_to_sell, target_currency
+        )
+        rate = rate_data.rate
         if rate == 0:
             raise ValueError(
                 f"Курс для {asset_to_sell} равен нулю, продажа невозможна"
@@ -234,12 +330,7 @@ class PortfolioService:
             destination_wallet = portfolio.add_currency(target_currency)
         destination_wallet.deposit(amount_in_target)
 
-        portfolios = self.db.get_portfolios()
-        for i, p in enumerate(portfolios):
-            if p.user_id == user_id:
-                portfolios[i] = portfolio
-                break
-        self.db.save_portfolios(portfolios)
+        self.db.save_portfolio(portfolio)
 
         return {
             "asset_sold": asset_to_sell,
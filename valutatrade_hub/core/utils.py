@@ -4,9 +4,25 @@ Utility helpers for ValutaTrade Hub.
 Вспомогательные функции для форматирования, валидации
 и работы с данными.
 """
+import re
 from datetime import datetime
 from typing import Optional
 
+# Криптовалюты округляются и форматируются с 8 знаками, остальные — с 2
+_CRYPTO_CODES = frozenset(("BTC", "ETH", "USDT"))
+
+# Форматтеры собраны один раз: связанный метод str.format не разбирает
+# шаблон заново и не требует поиска атрибута при каждом вызове
+_FMT_CRYPTO = "{:,.8f}".format
+_FMT_FIAT = "{:,.2f}".format
+# Тип "%" сам умножает на 100 и добавляет знак процента
+_FMT_PERCENT = {precision: f"{{:.{precision}%}}".format for precision in (0, 2, 4)}
+
+_DEFAULT_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Код валюты: 2–5 латинских заглавных букв, проверяется за один проход
+_CURRENCY_CODE_MATCH = re.compile(r"[A-Z]{2,5}").fullmatch
+
 
 def format_currency(amount: float, currency_code: str) -> str:
     """
@@ -27,15 +43,10 @@ def format_currency(amount: float, currency_code: str) -> str:
     """
     code = currency_code.upper()
     
-    # Для криптовалют используем больше знаков после запятой
-    if code in ("BTC", "ETH", "USDT"):
-        precision = 8
-    else:
-        precision = 2
-    
-    # Форматируем с разделителями тысяч
-    formatted = f"{amount:,.{precision}f}"
-    return f"{formatted} {code}"
+    # Для криптовалют используем больше знаков после запятой;
+    # форматируем с разделителями тысяч
+    fmt = _FMT_CRYPTO if code in _CRYPTO_CODES else _FMT_FIAT
+    return fmt(amount) + " " + code
 
 
 def validate_amount(amount: float, min_value: float = 0.0) -> bool:
@@ -57,11 +68,9 @@ def validate_amount(amount: float, min_value: float = 0.0) -> bool:
         >>> validate_amount(5, min_value=10)
         False
     """
-    if not isinstance(amount, (int, float)):
-        return False
-    if amount < min_value:
-        return False
-    return True
+    # Одно выражение вместо цепочки ветвлений; "not <" сохраняет
+    # прежнее поведение для NaN
+    return isinstance(amount, (int, float)) and not amount < min_value
 
 
 def round_amount(amount: float, currency_code: str) -> float:
@@ -81,13 +90,8 @@ def round_amount(amount: float, currency_code: str) -> float:
         >>> round_amount(0.123456789, "BTC")
         0.12345679
     """
-    code = currency_code.upper()
-    
-    # Для криптовалют используем 8 знаков
-    if code in ("BTC", "ETH", "USDT"):
-        return round(amount, 8)
-    # Для фиатных валют - 2 знака
-    return round(amount, 2)
+    # Для криптовалют используем 8 знаков, для фиатных валют - 2
+    return round(amount, 8 if currency_code.upper() in _CRYPTO_CODES else 2)
 
 
 def format_datetime(
@@ -110,9 +114,7 @@ def format_datetime(
         >>> format_datetime(dt, "%d.%m.%Y")
         '04.11.2025'
     """
-    if format_str:
-        return dt.strftime(format_str)
-    return dt.strftime("%Y-%m-%d %H:%M:%S")
+    return dt.strftime(format_str or _DEFAULT_DATETIME_FORMAT)
 
 
 def is_valid_currency_code(code: str) -> bool:
@@ -135,15 +137,7 @@ def is_valid_currency_code(code: str) -> bool:
         >>> is_valid_currency_code("TOOLONG")
         False
     """
-    if not isinstance(code, str):
-        return False
-    if not (2 <= len(code) <= 5):
-        return False
-    if not code.isupper():
-        return False
-    if not code.isalpha():
-        return False
-    return True
+    return isinstance(code, str) and _CURRENCY_CODE_MATCH(code) is not None
 
 
 def normalize_currency_code(code: str) -> str:
@@ -169,8 +163,13 @@ def normalize_currency_code(code: str) -> str:
         ...
         ValueError: Неверный формат кода валюты: 'invalid123'
     """
-    normalized = code.strip().upper()
-    if not is_valid_currency_code(normalized):
+    # Частый случай: код уже нормализован — возвращаем без новых строк
+    if _CURRENCY_CODE_MATCH(code) is not None:
+        return code
+    normalized = code.strip()
+    if not normalized.isupper():
+        normalized = normalized.upper()
+    if _CURRENCY_CODE_MATCH(normalized) is None:
         raise ValueError(f"Неверный формат кода валюты: '{code}'")
     return normalized
 
@@ -194,8 +193,10 @@ def format_percentage(value: float, precision: int = 2) -> str:
         >>> format_percentage(-0.0342)
         '-3.42%'
     """
-    percentage = value * 100
-    return f"{percentage:.{precision}f}%"
+    fmt = _FMT_PERCENT.get(precision)
+    if fmt is None:
+        return f"{value:.{precision}%}"
+    return fmt(value)
 
 
 def truncate_string(text: str, max_length: int, suffix: str = "...") -> str:
@@ -218,4 +219,4 @@ def truncate_string(text: str, max_length: int, suffix: str = "...") -> str:
     """
     if len(text) <= max_length:
         return text
-    return text[:max_length - len(suffix)] + suffix
+    return f"{text[:max_length - len(suffix)]}{suffix}"
@@ -5,13 +5,123 @@
 ключевых бизнес-операций (buy, sell, register, login).
 """
 import functools
+import inspect
 import logging
-from datetime import datetime
 from typing import Any, Callable
 
 # Настройка логгера для декоратора
 logger = logging.getLogger("valutatrade.actions")
 
+# Поля записи лога и имена параметров, из которых они берутся
+_LOGGED_FIELDS = {
+    "user_id": ("user_id",),
+    "currency": ("currency", "target_currency"),
+    "amount": ("amount", "amount_in_target"),
+    "username": ("username",),
+}
+
+
+# Шаблоны записей лога (форматируются логгером лениво). Время записи
+# добавляет форматтер обработчика (%(asctime)s), в сообщении его нет.
+_TRADE_FMT = (
+    "%s user_id=%s currency='%s' amount=%.4f rate=%s base='USD' result=OK"
+)
+_TRADE_VERBOSE_FMT = _TRADE_FMT + " | balance_change: %.4f -> %.4f"
+_AUTH_FMT = "%s username='%s' result=OK"
+_REGISTER_VERBOSE_FMT = _AUTH_FMT + " | new_user_id=%s"
+_LOGIN_VERBOSE_FMT = _AUTH_FMT + " | user_id=%s"
+_ERROR_SUFFIX = " result=ERROR error_type=%s error_message='%s'"
+
+
+# Поля, которые нужны записи лога каждого типа операции
+_ACTION_FIELDS = {
+    "BUY": ("user_id", "currency", "amount"),
+    "SELL": ("user_id", "currency", "amount"),
+    "REGISTER": ("username",),
+    "LOGIN": ("username",),
+}
+
+
+def _field_getters(func: Callable, fields: tuple) -> list:
+    """
+    Один раз сопоставляет полям лога параметры функции.
+
+    Возвращает список (поле, имя параметра, позиция в args). Поля,
+    которых у функции нет, в список не попадают.
+    """
+    positions = {
+        name: i for i, name in enumerate(inspect.signature(func).parameters)
+    }
+    getters = []
+    for field in fields:
+        for name in _LOGGED_FIELDS[field]:
+            if name in positions:
+                getters.append((field, name, positions[name]))
+                break
+    return getters
+
+
+def _success_logger(action_type: str, verbose: bool) -> Callable:
+    """
+    Выбирает запись об успешной операции один раз при декорировании.
+
+    Возвращает функцию (values, result), которая знает только
+    свой шаблон и не ветвится по типу операции на каждом вызове.
+    """
+    if action_type in ("BUY", "SELL"):
+        def log_trade(values: dict, result: Any) -> None:
+            head = (
+                action_type, values.get("user_id"),
+                values.get("currency"), values.get("amount"),
+            )
+            if not isinstance(result, dict):
+                logger.info(_TRADE_FMT, *head, 'N/A')
+            elif verbose:
+                logger.info(
+                    _TRADE_VERBOSE_FMT, *head, result.get('rate', 'N/A'),
+                    result.get('old_balance', 'N/A'),
+                    result.get('new_balance', 'N/A'),
+                )
+            else:
+                logger.info(_TRADE_FMT, *head, result.get('rate', 'N/A'))
+        return log_trade
+
+    if action_type in ("REGISTER", "LOGIN"):
+        if not verbose:
+            def log_auth(values: dict, result: Any) -> None:
+                logger.info(_AUTH_FMT, action_type, values.get("username"))
+            return log_auth
+
+        log_fmt = (
+            _REGISTER_VERBOSE_FMT if action_type == "REGISTER" else _LOGIN_VERBOSE_FMT
+        )
+
+        def log_auth_verbose(values: dict, result: Any) -> None:
+            logger.info(
+                log_fmt, action_type, values.get("username"),
+                getattr(result, 'user_id', 'N/A'),
+            )
+        return log_auth_verbose
+
+    def log_generic(values: dict, result: Any) -> None:
+        logger.info("%s result=OK", action_type)
+    return log_generic
+
+
+def _log_error(action_type: str, values: dict, error: Exception) -> None:
+    user_id = values.get("user_id")
+    currency = values.get("currency")
+    amount = values.get("amount")
+    log_fmt = "%s user_id=%s" if user_id else "%s username='%s'"
+    log_args = [action_type, user_id or values.get("username")]
+    if currency:
+        log_fmt += " currency='%s'"
+        log_args.append(currency)
+    if amount is not None:
+        log_fmt += " amount=%s"
+        log_args.append(amount)
+    logger.error(log_fmt + _ERROR_SUFFIX, *log_args, type(error).__name__, error)
+
 
 def log_action(
     action_type: str,
@@ -20,84 +130,38 @@ def log_action(
     """
     Декоратор для логирования доменных операций.
     """
+    log_success = _success_logger(action_type, verbose)
+
     def decorator(func: Callable) -> Callable:
+        # Позиции нужных параметров находим один раз при декорировании.
+        # Для операций вне _ACTION_FIELDS берем все поля: их пишет _log_error
+        getters = _field_getters(
+            func, _ACTION_FIELDS.get(action_type, tuple(_LOGGED_FIELDS))
+        )
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs) -> Any:
-            user_id = kwargs.get('user_id') or (args[1] if len(args) > 1 else None)
-            currency = kwargs.get('currency') or (args[2] if len(args) > 2 else None)
-            amount = kwargs.get('amount') or (args[3] if len(args) > 3 else None)
-            
-            username = kwargs.get('username') or (
-                args[1] if len(args) > 1 and action_type in ['REGISTER', 'LOGIN'] 
-                else None
-            )
-            
-            timestamp = datetime.now().isoformat()
-            
+            # Если логгер отключен, не тратим время ни на разбор
+            # аргументов, ни на сборку сообщения
+            if not logger.isEnabledFor(logging.ERROR):
+                return func(*args, **kwargs)
+
+            values = {}
+            for field, param, position in getters:
+                if param in kwargs:
+                    values[field] = kwargs[param]
+                else:
+                    values[field] = args[position] if position < len(args) else None
+
             try:
                 result = func(*args, **kwargs)
-                
-                if action_type in ['BUY', 'SELL']:
-                    if isinstance(result, dict):
-                        rate = result.get('rate', 'N/A')
-                    else:
-                        rate = 'N/A'
-                    
-                    log_msg = (
-                        f"{timestamp} {action_type} "
-                        f"user_id={user_id} currency='{currency}' "
-                        f"amount={amount:.4f} rate={rate} base='USD' result=OK"
-                    )
-                    
-                    if verbose and isinstance(result, dict):
-                        old_balance = result.get('old_balance', 'N/A')
-                        new_balance = result.get('new_balance', 'N/A')
-                        log_msg += (
-                            f" | balance_change: "
-                            f"{old_balance:.4f} -> {new_balance:.4f}"
-                        )
-                
-                elif action_type == 'REGISTER':
-                    log_msg = (
-                        f"{timestamp} {action_type} "
-                        f"username='{username}' result=OK"
-                    )
-                    if verbose and isinstance(result, object):
-                        user_id = getattr(result, 'user_id', 'N/A')
-                        log_msg += f" | new_user_id={user_id}"
-                
-                elif action_type == 'LOGIN':
-                    log_msg = (
-                        f"{timestamp} {action_type} "
-                        f"username='{username}' result=OK"
-                    )
-                    if verbose and isinstance(result, object):
-                        user_id = getattr(result, 'user_id', 'N/A')
-                        log_msg += f" | user_id={user_id}"
-                else:
-                    log_msg = f"{timestamp} {action_type} result=OK"
-                
-                logger.info(log_msg)
-                return result
-            
             except Exception as e:
-                error_type = type(e).__name__
-                error_message = str(e)
-                
-                log_parts = [
-                    f"{timestamp} {action_type}",
-                    f"user_id={user_id}" if user_id else f"username='{username}'",
-                    f"currency='{currency}'" if currency else "",
-                    f"amount={amount}" if amount is not None else "",
-                    "result=ERROR",
-                    f"error_type={error_type}",
-                    f"error_message='{error_message}'"
-                ]
-                log_msg = " ".join(part for part in log_parts if part)
-                
-                logger.error(log_msg)
+                _log_error(action_type, values, e)
                 raise
-        
+
+            if logger.isEnabledFor(logging.INFO):
+                log_success(values, result)
+            return result
+
         return wrapper
     return decorator
-
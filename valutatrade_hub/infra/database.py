@@ -4,7 +4,7 @@
 import json
 import os
 from pathlib import Path  # <-- ИМПОРТИРУЕМ Path
-from typing import Dict, List
+from typing import Any, Callable, Dict, List, Tuple
 
 # Используем наши кастомные исключения
 from ..core.exceptions import BaseWalletException
@@ -19,7 +19,16 @@ from .settings import SettingsLoader, SingletonMeta
 class DatabaseManager(metaclass=SingletonMeta):
     """
     Singleton для управления чтением и записью данных в JSON-файлы.
+
+    Пользователи и портфели хранятся как снимок (users.json, portfolios.json)
+    плюс журнал изменений в формате JSON Lines (*.log.jsonl). Одиночное
+    изменение дописывает в журнал одну строку; при чтении журнал
+    накладывается на снимок (последняя запись побеждает), а после
+    _COMPACT_EVERY строк снимок переписывается целиком и журнал удаляется.
     """
+
+    _COMPACT_EVERY = 1000
+
     def __init__(self):
         settings = SettingsLoader()
         # --- ИЗМЕНЕНИЕ: Превращаем строки в объекты Path ---
@@ -31,55 +40,376 @@ class DatabaseManager(metaclass=SingletonMeta):
         
         os.makedirs(self.data_dir, exist_ok=True)
 
+        # Разобранное содержимое файлов: путь -> (mtime файла в нс, объекты).
+        # Запись обновляется при сохранении и сбрасывается, если файл
+        # изменили извне.
+        self._cache: Dict[Path, Tuple[Any, Any]] = {}
+        # Число строк в журнале изменений каждого файла
+        self._journal_len: Dict[Path, int] = {}
+        # Сериализованные записи портфелей: user_id -> JSON-фрагмент.
+        # При сохранении одного портфеля заново кодируется только он.
+        self._portfolio_json: Dict[int, str] = {}
+        # Следующий свободный user_id (хранится в users.json вместе с пользователями)
+        self._next_user_id: int | None = None
+
 
     def _load_data(self, file_path: Path, default: any) -> any:
+        # Файл читаем целиком в байты: json.loads сам определяет UTF-8,
+        # и текстовая обертка над файлом не нужна
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
+            with open(file_path, 'rb') as f:
+                return json.loads(f.read())
+        except (FileNotFoundError, json.JSONDecodeError, UnicodeDecodeError):
             if default is not None:
                 self._save_data(file_path, default)
             return default
 
 
+    @staticmethod
+    def _mtime(file_path: Path) -> int | None:
+        try:
+            return file_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+
+    @staticmethod
+    def _journal_path(file_path: Path) -> Path:
+        return file_path.with_name(file_path.stem + ".log.jsonl")
+
+
+    def _state(self, file_path: Path, journaled: bool) -> Any:
+        """Версия файла для кэша: mtime снимка, а для файлов с журналом — и его."""
+        mtime = self._mtime(file_path)
+        if not journaled or mtime is None:
+            return mtime
+        return (mtime, self._mtime(self._journal_path(file_path)))
+
+
+    def _load_cached(
+        self,
+        file_path: Path,
+        default: any,
+        parse: Callable[..., Any],
+        journaled: bool = False,
+    ) -> Any:
+        """
+        Возвращает разобранный файл, перечитывая его только при смене mtime.
+
+        Для файлов с журналом parse получает еще и список записей журнала.
+        """
+        state = self._state(file_path, journaled)
+        cached = self._cache.get(file_path)
+        if cached is not None and state is not None and cached[0] == state:
+            return cached[1]
+        data = self._load_data(file_path, default)
+        if journaled:
+            value = parse(data, self._read_journal(file_path))
+        else:
+            value = parse(data)
+        self._cache[file_path] = (self._state(file_path, journaled), value)
+        return value
+
+
+    def _save_cached(self, file_path: Path, data: any, value: Any,
+                     journaled: bool = False) -> None:
+        """
+        Записывает данные в файл и кладет уже разобранные объекты в кэш.
+
+        Для файлов с журналом новый снимок уже содержит все изменения,
+        поэтому журнал удаляется.
+        """
+        self._save_data(file_path, data)
+        if journaled:
+            self._drop_journal(file_path)
+        self._cache[file_path] = (self._state(file_path, journaled), value)
+
+
+    def _read_journal(self, file_path: Path) -> List[dict]:
+        journal_path = self._journal_path(file_path)
+        records = []
+        good_lines = []
+        damaged = False
+        try:
+            with open(journal_path, 'rb') as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except (json.JSONDecodeError, UnicodeDecodeError):
+                        # Строка, оборванная при сбое записи, — пропускаем
+                        damaged = True
+                        continue
+                    good_lines.append(line.rstrip(b"\n").decode('utf-8'))
+        except FileNotFoundError:
+            pass
+        if damaged:
+            # Переписываем журнал без испорченных строк, иначе следующая
+            # запись склеится с оборванной строкой и тоже потеряется
+            self._write_text(journal_path, "".join(f"{ln}\n" for ln in good_lines))
+        self._journal_len[file_path] = len(records)
+        return records
+
+
+    def _append_journal(self, file_path: Path, record: str, value: Any) -> None:
+        """
+        Дописывает одну запись в журнал и обновляет кэш.
+
+        Когда журнал дорастает до _COMPACT_EVERY строк, вызывающий код
+        должен переписать снимок (см. _journal_full).
+        """
+        try:
+            with open(self._journal_path(file_path), 'ab') as f:
+                f.write((record + "\n").encode('utf-8'))
+        except IOError as e:
+            raise BaseWalletException(f"Ошибка записи в файл {file_path}: {e}")
+        self._journal_len[file_path] = self._journal_len.get(file_path, 0) + 1
+        self._cache[file_path] = (self._state(file_path, True), value)
+
+
+    def _journal_full(self, file_path: Path) -> bool:
+        return self._journal_len.get(file_path, 0) >= self._COMPACT_EVERY
+
+
+    def _drop_journal(self, file_path: Path) -> None:
+        try:
+            os.remove(self._journal_path(file_path))
+        except FileNotFoundError:
+            pass
+        self._journal_len[file_path] = 0
+
+
+    @staticmethod
+    def _dumps_compact(data: Any) -> str:
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
     def _save_data(self, file_path: Path, data: any) -> None:
+        # Хранилище пишем компактно: такой вывод идет через C-энкодер
+        # (с indent json работает на чистом Python) и вдвое короче.
+        # Читаемая копия для человека — export_pretty()
+        self._write_text(file_path, self._dumps_compact(data))
+
+
+    @staticmethod
+    def _write_text(file_path: Path, text: str) -> None:
+        # Текст кодируем один раз и пишем в бинарном режиме одним вызовом write.
+        # Запись идет во временный файл, который затем атомарно заменяет
+        # исходный: при сбое посреди записи старые данные останутся целыми.
+        tmp_path = file_path.with_name(file_path.name + ".tmp")
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=4, ensure_ascii=False)
+            with open(tmp_path, 'wb') as f:
+                f.write(text.encode('utf-8'))
+            os.replace(tmp_path, file_path)
         except IOError as e:
             raise BaseWalletException(f"Ошибка записи в файл {file_path}: {e}")
 
 
     # --- Методы для пользователей ---
+    def _parse_users(
+        self, users_data: list | dict, journal: List[dict]
+    ) -> Dict[str, User]:
+        if isinstance(users_data, dict):
+            records = users_data.get("users", [])
+            next_id = users_data.get("next_user_id")
+        else:
+            # Старый формат: просто список пользователей без счетчика
+            records, next_id = users_data, None
+        users = {u.username: u for u in map(User.from_dict, records)}
+        if next_id is None:
+            next_id = max((u.user_id for u in users.values()), default=0) + 1
+        # Накладываем журнал: последняя запись пользователя побеждает
+        for user in map(User.from_dict, journal):
+            users[user.username] = user
+            next_id = max(next_id, user.user_id + 1)
+        self._next_user_id = max(next_id, self._next_user_id or 0)
+        return users
+
+
+    def _get_users_map(self) -> Dict[str, User]:
+        # Пользователи в памяти: username -> User (в порядке файла)
+        return self._load_cached(
+            self.users_path, [], self._parse_users, journaled=True
+        )
+
+
     def get_users(self) -> List[User]:
-        users_data = self._load_data(self.users_path, [])
-        return [User.from_dict(u) for u in users_data]
+        return list(self._get_users_map().values())
+
+
+    def get_user_by_username(self, username: str) -> User | None:
+        """Возвращает пользователя по имени или None."""
+        return self._get_users_map().get(username)
 
 
     def save_users(self, users: List[User]) -> None:
-        self._save_data(self.users_path, [u.to_dict() for u in users])
+        self._next_user_id = max(
+            self._next_user_id or 1,
+            max((u.user_id for u in users), default=0) + 1,
+        )
+        self._save_cached(
+            self.users_path,
+            {
+                "users": [u.to_dict() for u in users],
+                "next_user_id": self._next_user_id,
+            },
+            {u.username: u for u in users},
+            journaled=True,
+        )
+
+
+    def append_user(self, user: User) -> None:
+        """
+        Добавляет (или заменяет) одного пользователя.
+
+        Пишется одна строка в журнал, а не весь список пользователей.
+        """
+        users = self._get_users_map()
+        users[user.username] = user
+        self._next_user_id = max(self._next_user_id or 1, user.user_id + 1)
+        self._append_journal(
+            self.users_path, self._dumps_compact(user.to_dict()), users
+        )
+        if self._journal_full(self.users_path):
+            self.save_users(list(users.values()))
+
+
+    def allocate_user_id(self) -> int:
+        """Выдает следующий свободный user_id и сдвигает счетчик."""
+        # Загрузка users.json заодно подтягивает сохраненный счетчик
+        self._get_users_map()
+        user_id = self._next_user_id
+        self._next_user_id += 1
+        return user_id
 
 
     # --- Методы для портфелей ---
+    def _parse_portfolios(
+        self, portfolios_data: list, journal: List[dict]
+    ) -> Dict[int, Portfolio]:
+        # Файл перечитан — ранее закодированные фрагменты могли устареть
+        self._portfolio_json = {}
+        portfolios = {}
+        # Записи журнала идут после снимка: последняя версия портфеля побеждает
+        for p in portfolios_data + journal:
+            portfolio = Portfolio.from_dict(p)
+            portfolios[portfolio.user_id] = portfolio
+        return portfolios
+
+
+    def _get_portfolios_map(self) -> Dict[int, Portfolio]:
+        # Портфели в памяти: user_id -> Portfolio
+        return self._load_cached(
+            self.portfolios_path, [], self._parse_portfolios, journaled=True
+        )
+
+
+    def _write_portfolios(self, portfolios: Dict[int, Portfolio]) -> None:
+        """
+        Переписывает снимок portfolios.json и удаляет журнал.
+
+        Для портфелей с сохраненным JSON-фрагментом повторно
+        не вызываются to_dict и json.dumps.
+        """
+        fragments = self._portfolio_json
+        parts = []
+        for user_id, portfolio in portfolios.items():
+            fragment = fragments.get(user_id)
+            if fragment is None:
+                fragment = self._dumps_compact(portfolio.to_dict())
+                fragments[user_id] = fragment
+            parts.append(fragment)
+        self._write_text(self.portfolios_path, "[" + ",".join(parts) + "]")
+        self._drop_journal(self.portfolios_path)
+        self._cache[self.portfolios_path] = (
+            self._state(self.portfolios_path, True),
+            portfolios,
+        )
+
+
     def get_portfolios(self) -> List[Portfolio]:
-        portfolios_data = self._load_data(self.portfolios_path, [])
-        return [Portfolio.from_dict(p) for p in portfolios_data]
+        return list(self._get_portfolios_map().values())
 
 
     def save_portfolios(self, portfolios: List[Portfolio]) -> None:
-        self._save_data(self.portfolios_path, [p.to_dict() for p in portfolios])
+        self._portfolio_json = {}
+        self._write_portfolios({p.user_id: p for p in portfolios})
+
+
+    def get_portfolio(self, user_id: int) -> Portfolio | None:
+        """Возвращает портфель пользователя или None."""
+        return self._get_portfolios_map().get(user_id)
+
+
+    def save_portfolio(self, portfolio: Portfolio) -> None:
+        """
+        Сохраняет (добавляет или заменяет) портфель одного пользователя.
+
+        В журнал дописывается одна строка с этим портфелем, так что сделка
+        сериализует и пишет только его. Портфель, измененный на месте,
+        нужно передать сюда.
+
+        Если запись не удалась, кэш портфелей сбрасывается: изменения уже
+        внесены в объекты в памяти, и следующее чтение должно вернуть
+        состояние с диска, а не несохраненную сделку.
+        """
+        portfolios = self._get_portfolios_map()
+        portfolios[portfolio.user_id] = portfolio
+        try:
+            fragment = self._dumps_compact(portfolio.to_dict())
+            self._portfolio_json[portfolio.user_id] = fragment
+            self._append_journal(self.portfolios_path, fragment, portfolios)
+            if self._journal_full(self.portfolios_path):
+                self._write_portfolios(portfolios)
+        except Exception:
+            self._cache.pop(self.portfolios_path, None)
+            self._portfolio_json.pop(portfolio.user_id, None)
+            raise
 
 
     # --- Методы для курсов ---
     def get_rates(self) -> Dict | None:
         """Читает и возвращает данные о курсах из файла."""
-        if not self.rates_path.exists():
-            return None
-        # Используем общий метод загрузки для консистентности
-        return self._load_data(self.rates_path, None)
+        # Кэш по mtime: при попадании нужен один stat. Отсутствующий файл
+        # дает None без отдельной проверки exists()
+        return self._load_cached(self.rates_path, None, lambda data: data)
+
+
+    def get_rates_mtime(self) -> int | None:
+        """Возвращает время изменения файла курсов (нс) или None, если его нет."""
+        return self._mtime(self.rates_path)
 
 
     def save_rates(self, rates: Dict) -> None:
-        self._save_data(self.rates_path, rates)
+        self._save_cached(self.rates_path, rates, rates)
+
+
+    # --- Экспорт ---
+    def export_pretty(self, dest_dir: Path) -> List[Path]:
+        """
+        Сохраняет читаемую копию данных (с отступами) в каталог dest_dir.
 
+        Экспортируются актуальные данные с учетом журналов изменений.
+        Возвращает список записанных файлов.
+        """
+        dest_dir = Path(dest_dir)
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        users = self.get_users()
+        exports = {
+            self.users_path.name: {
+                "users": [u.to_dict() for u in users],
+                "next_user_id": self._next_user_id,
+            },
+            self.portfolios_path.name: [
+                p.to_dict() for p in self.get_portfolios()
+            ],
+        }
+        rates = self.get_rates()
+        if rates is not None:
+            exports[self.rates_path.name] = rates
 
+        written = []
+        for name, data in exports.items():
+            path = dest_dir / name
+            self._write_text(path, json.dumps(data, indent=4, ensure_ascii=False))
+            written.append(path)
+        return written
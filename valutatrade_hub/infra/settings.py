@@ -6,9 +6,13 @@
 - Обоснование выбора: метакласс обеспечивает контроль на уровне создания класса,
   что делает невозможным случайное создание второго экземпляра даже при импортах.
   Более явный и контролируемый подход по сравнению с __new__.
-- Потокобезопасность не требуется, так как приложение однопоточное (CLI).
+- Потокобезопасность: первое создание экземпляра защищено блокировкой
+  (в приложении есть фоновые потоки — QueueListener логгера действий,
+  потоки запросов к API и фоновый цикл обновления курсов),
+  а повторные обращения обходятся без нее.
 """
 import json
+import threading
 from pathlib import Path
 from typing import Any
 
@@ -26,19 +30,28 @@ class SingletonMeta(type):
     - Чистый и явный синтаксис использования
     - Не требует переопределения __new__ или __init__ в дочерних классах
     
-    Потокобезопасность не реализована, так как приложение однопоточное.
+    Потокобезопасность: блокировка с двойной проверкой. Уже созданный
+    экземпляр возвращается без захвата блокировки. Блокировка реентерабельная:
+    конструктор одного синглтона может создавать другой (DatabaseManager
+    создает SettingsLoader).
     """
     _instances = {}
+    _lock = threading.RLock()
 
     def __call__(cls, *args, **kwargs):
         """
         Перехватывает вызов конструктора класса.
         Возвращает существующий экземпляр или создает новый.
         """
-        if cls not in cls._instances:
-            instance = super().__call__(*args, **kwargs)
-            cls._instances[cls] = instance
-        return cls._instances[cls]
+        instance = cls._instances.get(cls)
+        if instance is not None:
+            return instance
+        with cls._lock:
+            instance = cls._instances.get(cls)
+            if instance is None:
+                instance = super().__call__(*args, **kwargs)
+                cls._instances[cls] = instance
+            return instance
 
 
 class SettingsLoader(metaclass=SingletonMeta):
@@ -117,6 +130,14 @@ class SettingsLoader(metaclass=SingletonMeta):
             # При любой ошибке используем дефолтные значения
             self._config = default_config
 
+        # Часто читаемые настройки кешируем атрибутами, чтобы свойства
+        # не искали их в словаре при каждом обращении
+        self._data_dir = self._config.get("DATA_DIR")
+        self._rates_ttl_seconds = self._config.get("RATES_TTL_SECONDS", 300)
+        self._default_base_currency = self._config.get(
+            "DEFAULT_BASE_CURRENCY", "USD"
+        )
+
     def get(self, key: str, default: Any = None) -> Any:
         """
         Получает значение настройки по ключу.
@@ -151,7 +172,7 @@ class SettingsLoader(metaclass=SingletonMeta):
             >>> print(settings.data_dir)
             'data'
         """
-        return self.get("DATA_DIR")
+        return self._data_dir
     
     @property
     def rates_ttl_seconds(self) -> int:
@@ -163,7 +184,7 @@ class SettingsLoader(metaclass=SingletonMeta):
         Returns:
             Количество секунд
         """
-        return self.get("RATES_TTL_SECONDS", 300)
+        return self._rates_ttl_seconds
     
     @property
     def default_base_currency(self) -> str:
@@ -173,7 +194,7 @@ class SettingsLoader(metaclass=SingletonMeta):
         Returns:
             Код валюты (например, "USD")
         """
-        return self.get("DEFAULT_BASE_CURRENCY", "USD")
+        return self._default_base_currency
 
 
 # Места использования SettingsLoader в проекте:
@@ -3,10 +3,15 @@
 
 Настраивает форматы логов, уровни, ротацию файлов и обработчики.
 """
+import atexit
 import logging
 import logging.handlers
+import queue
 from pathlib import Path
 
+# Фоновый поток, который пишет записи логгера действий в файл
+_actions_listener: logging.handlers.QueueListener | None = None
+
 
 def setup_logging(log_file: str = "logs/actions.log", log_level: str = "INFO"):
     """
@@ -26,9 +31,10 @@ def setup_logging(log_file: str = "logs/actions.log", log_level: str = "INFO"):
         root_logger.handlers.clear()
 
     # === 2. Форматтеры ===
-    # Подробный формат для файла
+    # Подробный формат для файла (с миллисекундами: по этой метке
+    # упорядочиваются записи операций, своей метки в сообщении у них нет)
     file_formatter = logging.Formatter(
-        "%(asctime)s %(levelname)s %(name)s: %(message)s",
+        "%(asctime)s.%(msecs)03d %(levelname)s %(name)s: %(message)s",
         datefmt="%Y-%m-%d %H:%M:%S",
     )
     # Простой формат для консоли (только само сообщение)
@@ -54,22 +60,38 @@ def setup_logging(log_file: str = "logs/actions.log", log_level: str = "INFO"):
 
     # === 5. Отдельная настройка для логгера декоратора ===
     # Чтобы его сообщения ERROR не попадали в консоль
+    global _actions_listener
+    if _actions_listener is not None:
+        _actions_listener.stop()
     actions_logger = logging.getLogger("valutatrade.actions")
     actions_logger.propagate = False  # Отключаем проброс наверх
     actions_logger.setLevel(numeric_level)
-    # Добавляем ТОЛЬКО файловый обработчик
-    action_file_handler = logging.handlers.RotatingFileHandler(
-        filename=log_file, maxBytes=10 * 1024 * 1024, backupCount=5, encoding="utf-8"
+    actions_logger.handlers.clear()
+    # Добавляем ТОЛЬКО файловый обработчик — тот же, что у корневого
+    # логгера: один дескриптор и одна ротация файла. Дублей записей нет,
+    # потому что проброс наверх отключен.
+    # Операции (buy/sell/login) только кладут запись в очередь,
+    # а запись в файл делает фоновый поток QueueListener
+    actions_queue = queue.SimpleQueue()
+    actions_logger.addHandler(logging.handlers.QueueHandler(actions_queue))
+    _actions_listener = logging.handlers.QueueListener(
+        actions_queue, file_handler, respect_handler_level=True
     )
-    action_file_handler.setFormatter(file_formatter)
-    actions_logger.addHandler(action_file_handler)
+    _actions_listener.start()
+    atexit.register(_stop_actions_listener)
 
 
     # Логируем успешную инициализацию (используем actions_logger)
-    logging.getLogger("valutatrade.actions").info("=" * 60)
-    logging.getLogger("valutatrade.actions").info("Logging system initialized")
-    logging.getLogger("valutatrade.actions").info(f"Log file: {log_file}")
-    logging.getLogger("valutatrade.actions").info(f"Log level: {log_level}")
-    logging.getLogger("valutatrade.actions").info("=" * 60)
+    actions_logger.info("=" * 60)
+    actions_logger.info("Logging system initialized")
+    actions_logger.info("Log file: %s", log_file)
+    actions_logger.info("Log level: %s", log_level)
+    actions_logger.info("=" * 60)
 
 
+def _stop_actions_listener() -> None:
+    """Дописывает записи из очереди в файл и останавливает фоновый поток."""
+    global _actions_listener
+    if _actions_listener is not None:
+        _actions_listener.stop()
+        _actions_listener = None
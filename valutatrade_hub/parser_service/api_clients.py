@@ -1,12 +1,15 @@
 """
 API клиенты для получения курсов валют из внешних источников.
 """
+import json
 import logging
 import time
 from abc import ABC, abstractmethod
 from typing import Any, Dict
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from ..core.exceptions import (
     ApiRequestError,
@@ -18,24 +21,107 @@ from .config import ParserConfig
 logger = logging.getLogger(__name__)
 
 
+class _CappedRetry(Retry):
+    """Retry, который ждет по Retry-After не дольше RETRY_AFTER_MAX секунд."""
+
+    RETRY_AFTER_MAX = 30
+
+    def get_retry_after(self, response) -> float | None:
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, self.RETRY_AFTER_MAX)
+
+
 class BaseApiClient(ABC):
     """Абстрактный базовый класс для всех API клиентов."""
 
     def __init__(self, config: ParserConfig):
         self.config = config
         self.source_name = "Unknown"
+        self._session = self._create_session()
+        # Условные запросы: ETag последнего ответа 200 и разобранные
+        # из него курсы по URL. На 304 сервер тело не шлет.
+        self._etags: Dict[str, str] = {}
+        self._last_rates: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        # True, если последний fetch_rates получил 304 Not Modified
+        self.not_modified = False
+
+    def _create_session(self) -> requests.Session:
+        """
+        Создает сессию с пулом соединений (keep-alive) и повторами.
+
+        Повторные обновления идут по уже открытому TCP/TLS-соединению.
+        Сбои соединения, таймауты, 429 и 5xx повторяются с экспоненциальной
+        задержкой и случайной добавкой (jitter); на 429 учитывается
+        Retry-After. После исчерпания повторов возвращается последний
+        ответ, чтобы 429 по-прежнему превращался в RateLimitError.
+        """
+        retry = _CappedRetry(
+            total=self.config.MAX_RETRIES,
+            backoff_factor=0.3,
+            backoff_max=30,
+            backoff_jitter=1.0,
+            status_forcelist=[429, 500, 502, 503, 504],
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=retry)
+        session = requests.Session()
+        session.mount("https://", adapter)
+        return session
+
+    def close(self) -> None:
+        """Закрывает соединения сессии."""
+        self._session.close()
 
     @abstractmethod
     def fetch_rates(self) -> Dict[str, Dict[str, Any]]:
         pass
 
+    def _fetch_parsed(
+        self, url: str, params: dict = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Запрашивает url с If-None-Match и разбирает ответ.
+
+        На 304 возвращает курсы, разобранные из прошлого ответа.
+        """
+        response = self._make_request(
+            url, self.source_name, params=params, etag=self._etags.get(url)
+        )
+        if response.status_code == 304 and url in self._last_rates:
+            self.not_modified = True
+            return self._last_rates[url]
+
+        self.not_modified = False
+        # json.loads разбирает байты тела сам (UTF-8 определяется по ним),
+        # без промежуточной строки response.text
+        try:
+            data = json.loads(response.content)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise InvalidResponseError(self.source_name, f"Invalid JSON: {e}")
+        rates = self._parse_response(data, response)
+        etag = response.headers.get("ETag")
+        if etag:
+            self._etags[url] = etag
+            self._last_rates[url] = rates
+        return rates
+
     def _make_request(
-        self, url: str, service_name: str, params: dict = None
+        self,
+        url: str,
+        service_name: str,
+        params: dict = None,
+        etag: str | None = None,
     ) -> requests.Response:
         start_time = time.perf_counter()
+        headers = {"If-None-Match": etag} if etag else None
         try:
-            response = requests.get(
-                url, params=params, timeout=self.config.REQUEST_TIMEOUT
+            response = self._session.get(
+                url,
+                params=params,
+                headers=headers,
+                timeout=self.config.REQUEST_TIMEOUT,
             )
             elapsed_ms = round((time.perf_counter() - start_time) * 1000)
             response.request.meta = {
@@ -60,17 +146,20 @@ class CoinGeckoClient(BaseApiClient):
     def __init__(self, config: ParserConfig):
         super().__init__(config)
         self.source_name = "CoinGecko"
+        # Все, что зависит только от конфигурации, считаем один раз:
+        # id монеты CoinGecko -> ключ пары ("bitcoin" -> "BTC_USD")
+        self._vs_key = config.BASE_CURRENCY.lower()
+        self._pair_by_id = {
+            coin_id: f"{ticker}_{config.BASE_CURRENCY}"
+            for ticker, coin_id in config.CRYPTO_ID_MAP.items()
+        }
+        self._params = {
+            "ids": ",".join(config.CRYPTO_ID_MAP.values()),
+            "vs_currencies": self._vs_key,
+        }
 
     def fetch_rates(self) -> Dict[str, Dict[str, Any]]:
-        crypto_ids = ",".join(self.config.CRYPTO_ID_MAP.values())
-        params = {
-            "ids": crypto_ids,
-            "vs_currencies": self.config.BASE_CURRENCY.lower(),
-        }
-        response = self._make_request(
-            self.config.COINGECKO_URL, self.source_name, params=params
-        )
-        return self._parse_response(response.json(), response)
+        return self._fetch_parsed(self.config.COINGECKO_URL, params=self._params)
 
     def _parse_response(
         self, data: dict, response: requests.Response
@@ -81,18 +170,20 @@ class CoinGeckoClient(BaseApiClient):
             "status_code": response.status_code,
             "etag": response.headers.get("ETag"),
         }
+        pair_by_id = self._pair_by_id
+        vs_key = self._vs_key
         try:
-            for ticker, coin_id in self.config.CRYPTO_ID_MAP.items():
-                if coin_id in data:
-                    rate_key = f"{ticker}_{self.config.BASE_CURRENCY}"
-                    rate_value = float(
-                        data[coin_id][self.config.BASE_CURRENCY.lower()]
-                    )
-                    meta = meta_base.copy()
-                    meta["raw_id"] = coin_id
-                    rates[rate_key] = {"rate": rate_value, "meta": meta}
+            # В ответе только запрошенные монеты: идем по нему напрямую
+            for coin_id, prices in data.items():
+                rate_key = pair_by_id.get(coin_id)
+                if rate_key is None:
+                    continue
+                rates[rate_key] = {
+                    "rate": float(prices[vs_key]),
+                    "meta": {**meta_base, "raw_id": coin_id},
+                }
             return rates
-        except (KeyError, ValueError, TypeError) as e:
+        except (AttributeError, KeyError, ValueError, TypeError) as e:
             raise InvalidResponseError(
                 self.source_name, f"Invalid response: {e}"
             )
@@ -114,8 +205,7 @@ class ExchangeRateApiClient(BaseApiClient):
             f"{self.config.EXCHANGERATE_API_KEY}/"
             f"latest/{self.config.BASE_CURRENCY}"
         )
-        response = self._make_request(url, self.source_name)
-        return self._parse_response(response.json(), response)
+        return self._fetch_parsed(url)
 
     def _parse_response(
         self, data: dict, response: requests.Response
@@ -138,13 +228,15 @@ class ExchangeRateApiClient(BaseApiClient):
             conversion_rates = data.get("conversion_rates", {})
             base_code = data.get("base_code", self.config.BASE_CURRENCY)
 
+            # В ответе ~160 валют, нужных — несколько: идем по списку
+            # из конфигурации, по одному обращению к словарю на валюту
             for currency in self.config.FIAT_CURRENCIES:
-                if currency in conversion_rates:
-                    rate_key = f"{currency}_{base_code}"
-                    rate_value = float(conversion_rates[currency])
-                    meta = meta_base.copy()
-                    meta["raw_id"] = currency
-                    rates[rate_key] = {"rate": rate_value, "meta": meta}
+                rate = conversion_rates.get(currency)
+                if rate is not None:
+                    rates[f"{currency}_{base_code}"] = {
+                        "rate": float(rate),
+                        "meta": {**meta_base, "raw_id": currency},
+                    }
             return rates
         except (KeyError, ValueError, TypeError) as e:
             raise InvalidResponseError(
@@ -6,17 +6,39 @@
 """
 import os
 from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
 
-from dotenv import load_dotenv
+from dotenv import dotenv_values
 
-# Загружаем переменные окружения из .env файла
-load_dotenv()
 
+@lru_cache(maxsize=1)
+def _load_env() -> None:
+    """
+    Загружает переменные окружения из .env файла — один раз за процесс.
 
-@dataclass
+    Вызывается при создании конфигурации, а не при импорте модуля.
+    Уже заданные переменные окружения не перезаписываются.
+    """
+    for key, value in dotenv_values().items():
+        if value is not None:
+            os.environ.setdefault(key, value)
+
+
+def _getenv(name: str, default: str = "") -> str:
+    _load_env()
+    return os.getenv(name, default)
+
+
+@dataclass(frozen=True, slots=True)
 class ParserConfig:
-    """Конфигурация парсера курсов валют."""
+    """
+    Конфигурация парсера курсов валют.
+
+    Неизменяемая и со __slots__: значения читаются при каждом запросе
+    и разборе ответа, а случайная опечатка в имени атрибута не создаст
+    новое поле.
+    """
 
     # API URLs
     COINGECKO_URL: str = "https://api.coingecko.com/api/v3/simple/price"
@@ -25,7 +47,7 @@ class ParserConfig:
     # API Keys (загружаются из переменных окружения)
     # ВАЖНО: Атрибут с МАЛЕНЬКИМИ буквами для совместимости с api_clients.py
     EXCHANGERATE_API_KEY: str = field(
-        default_factory=lambda: os.getenv("EXCHANGERATE_API_KEY", "")
+        default_factory=lambda: _getenv("EXCHANGERATE_API_KEY")
     )
 
     # Mapping криптовалют для CoinGecko API
@@ -48,17 +70,26 @@ class ParserConfig:
     # Пути к файлам хранилища
     DATA_DIR: Path = field(default_factory=lambda: Path("data"))
 
-    @property
-    def RATES_FILE_PATH(self) -> Path:
-        return self.DATA_DIR / "rates.json"
-
-    @property
-    def HISTORY_FILE_PATH(self) -> Path:
-        return self.DATA_DIR / "exchange_rates.json"
-
     # Параметры обновления
     UPDATE_INTERVAL_SECONDS: int = 3600  # 1 час
     REQUEST_TIMEOUT: int = 10  # секунды
     MAX_RETRIES: int = 3
 
+    # Пути к файлам, вычисляются из DATA_DIR один раз при создании
+    RATES_FILE_PATH: Path = field(init=False, repr=False)
+    # JSON Lines: одна запись на строку, новые записи дописываются в конец
+    HISTORY_FILE_PATH: Path = field(init=False, repr=False)
+    # Прежний формат истории (JSON-массив), переносится автоматически
+    LEGACY_HISTORY_FILE_PATH: Path = field(init=False, repr=False)
+
+    def __post_init__(self):
+        # Конфигурация неизменяема, поэтому пути задаем через object.__setattr__
+        object.__setattr__(self, "RATES_FILE_PATH", self.DATA_DIR / "rates.json")
+        object.__setattr__(
+            self, "HISTORY_FILE_PATH", self.DATA_DIR / "exchange_rates.jsonl"
+        )
+        object.__setattr__(
+            self, "LEGACY_HISTORY_FILE_PATH", self.DATA_DIR / "exchange_rates.json"
+        )
+
 
@@ -1,29 +1,64 @@
 """
 Модуль для управления хранилищем курсов валют.
 """
+import heapq
 import json
 import logging
-from datetime import datetime
+import os
+from collections import deque
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Set
 
 from .config import ParserConfig
 
 logger = logging.getLogger(__name__)
 
+# Сколько id последних записей истории держим в памяти для проверки дублей
+_RECENT_IDS_LIMIT = 10_000
+# Сколько байт с конца файла истории читаем, чтобы собрать эти id
+_HISTORY_TAIL_BYTES = 4 * 1024 * 1024
+
+
+def _utcnow() -> datetime:
+    """Текущее время UTC (замена устаревшему datetime.utcnow)."""
+    return datetime.now(timezone.utc)
+
 
 class RatesStorage:
     """Менеджер хранилища курсов валют."""
 
     def __init__(self, config: ParserConfig):
         self.config = config
+        # id последних записей истории: очередь задает порядок вытеснения,
+        # множество — быструю проверку. Заполняются при первой записи.
+        self._recent_ids: Optional[Deque[str]] = None
+        self._recent_id_set: Set[str] = set()
+        self._migrate_legacy_history()
+
+    @staticmethod
+    def format_timestamp(timestamp: datetime) -> str:
+        """
+        Форматирует время обновления как ISO 8601 в UTC с суффиксом Z.
+
+        Время без tzinfo считается уже заданным в UTC.
+        """
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+        return timestamp.isoformat() + "Z"
+
+    @staticmethod
+    def _rate_id_suffix(timestamp: datetime) -> str:
+        """Метка времени для id записей курса (одна на все пары обновления)."""
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone(timezone.utc)
+        return timestamp.strftime("%Y-%m-%dT%H:%M:%SZ")
 
     @staticmethod
     def _generate_rate_id(
-        from_currency: str, to_currency: str, timestamp: datetime
+        from_currency: str, to_currency: str, timestamp_str: str
     ) -> str:
         """Генерирует уникальный идентификатор для записи курса."""
-        timestamp_str = timestamp.strftime("%Y-%m-%dT%H:%M:%SZ")
         return f"{from_currency}_{to_currency}_{timestamp_str}"
 
     def save_to_history(
@@ -33,45 +68,74 @@ class RatesStorage:
         timestamp: Optional[datetime] = None,
     ) -> int:
         """Сохраняет курсы в файл истории."""
+        return self.save_to_history_bulk({source: rates_data}, timestamp)
+
+    def save_to_history_bulk(
+        self,
+        rates_by_source: Dict[str, Dict[str, Dict[str, Any]]],
+        timestamp: Optional[datetime] = None,
+    ) -> int:
+        """
+        Сохраняет курсы нескольких источников в историю одной записью.
+
+        Args:
+            rates_by_source: Имя источника -> курсы в формате fetch_rates
+            timestamp: Время обновления (общее для всех источников)
+
+        Returns:
+            Количество добавленных записей
+        """
         if timestamp is None:
-            timestamp = datetime.utcnow()
+            timestamp = _utcnow()
 
-        history = self._read_history()
-        existing_ids = {r.get("id") for r in history}
-        added_count = 0
+        if self._recent_ids is None:
+            self._load_recent_ids()
+        new_records = []
+        new_ids = []
+        # id текущей пачки: дубли внутри нее тоже отсекаем
+        batch_ids: Set[str] = set()
+        # Метки времени одинаковы для всех пар — форматируем их один раз
+        id_suffix = self._rate_id_suffix(timestamp)
+        iso_timestamp = self.format_timestamp(timestamp)
 
-        for pair_key, data in rates_data.items():
-            parts = pair_key.split("_")
-            if len(parts) != 2:
-                logger.warning(f"Invalid pair key format: {pair_key}")
-                continue
+        for source, rates_data in rates_by_source.items():
+            for pair_key, data in rates_data.items():
+                parts = pair_key.split("_")
+                if len(parts) != 2:
+                    logger.warning(f"Invalid pair key format: {pair_key}")
+                    continue
 
-            from_currency, to_currency = parts
-            record_id = self._generate_rate_id(
-                from_currency, to_currency, timestamp
-            )
+                from_currency, to_currency = parts
+                record_id = self._generate_rate_id(
+                    from_currency, to_currency, id_suffix
+                )
 
-            if record_id in existing_ids:
-                continue
+                if record_id in self._recent_id_set or record_id in batch_ids:
+                    continue
+
+                new_records.append({
+                    "id": record_id,
+                    "from_currency": from_currency,
+                    "to_currency": to_currency,
+                    "rate": data["rate"],
+                    "timestamp": iso_timestamp,
+                    "source": source,
+                    "meta": data.get("meta", {}),
+                })
+                new_ids.append(record_id)
+                batch_ids.add(record_id)
 
-            record = {
-                "id": record_id,
-                "from_currency": from_currency,
-                "to_currency": to_currency,
-                "rate": data["rate"],
-                "timestamp": timestamp.isoformat() + "Z",
-                "source": source,
-                "meta": data.get("meta", {}),
-            }
-            history.append(record)
-            added_count += 1
-
-        if added_count > 0:
-            self._write_history(history)
+        if new_records:
+            self._append_history(new_records)
+            # id запоминаем после успешной записи: при ошибке повторное
+            # сохранение тех же курсов не будет принято за дубль
+            for record_id in new_ids:
+                self._remember_id(record_id)
             logger.info(
-                f"Saved {added_count} new records to history from {source}"
+                f"Saved {len(new_records)} new records to history from "
+                f"{', '.join(rates_by_source)}"
             )
-        return added_count
+        return len(new_records)
 
     def update_rates_cache(
         self,
@@ -90,24 +154,20 @@ class RatesStorage:
           "last_refresh": "..."
         }
         """
-        if timestamp is None:
-            timestamp = datetime.utcnow()
-
         logger.info("Updating rates cache with the correct flat structure.")
 
-        # 1. Создаем пустой словарь для итогового JSON
-        final_json_data = {}
+        updated_at = self.format_timestamp(timestamp or _utcnow())
 
-        # 2. Добавляем каждую пару валют напрямую в словарь (НЕ в "pairs"!)
-        for pair_key, data in rates_data.items():
-            final_json_data[pair_key] = {
-                "rate": data["rate"],
-                "updated_at": timestamp.isoformat() + "Z",
-            }
+        # 1-2. Собираем итоговый JSON: каждая пара валют — прямо
+        # в словаре (НЕ в "pairs"!), одним генератором словаря
+        final_json_data = {
+            pair_key: {"rate": data["rate"], "updated_at": updated_at}
+            for pair_key, data in rates_data.items()
+        }
 
         # 3. Добавляем метаданные на верхний уровень
         final_json_data["source"] = source
-        final_json_data["last_refresh"] = timestamp.isoformat() + "Z"
+        final_json_data["last_refresh"] = updated_at
 
         # 4. Сохраняем итоговый JSON
         self._write_rates_cache(final_json_data)
@@ -124,56 +184,140 @@ class RatesStorage:
         limit: Optional[int] = None,
     ) -> List[Dict]:
         """Получает записи из истории с возможностью фильтрации."""
-        history = self._read_history()
+        # Файл читается построчно, в памяти остаются только подходящие записи
+        history: Iterable[Dict] = self._iter_history()
         if from_currency:
-            history = [
+            history = (
                 r for r in history if r.get("from_currency") == from_currency
-            ]
+            )
         if to_currency:
-            history = [
+            history = (
                 r for r in history if r.get("to_currency") == to_currency
-            ]
+            )
 
-        history.sort(key=lambda r: r.get("timestamp", ""), reverse=True)
-        return history[:limit] if limit else history
+        def by_timestamp(record: Dict) -> str:
+            return record.get("timestamp", "")
 
-    def _read_history(self) -> List[Dict]:
-        """Читает файл истории exchange_rates.json."""
-        if not self.config.HISTORY_FILE_PATH.exists():
-            return []
+        if limit:
+            return heapq.nlargest(limit, history, key=by_timestamp)
+        return sorted(history, key=by_timestamp, reverse=True)
+
+    @staticmethod
+    def _parse_lines(lines: Iterable[bytes]) -> Iterator[Dict]:
+        """Разбирает строки JSON Lines, пропуская пустые и поврежденные."""
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                logger.warning("Skipping damaged history line")
+
+    def _iter_history(self) -> Iterator[Dict]:
+        """Построчно читает файл истории exchange_rates.jsonl."""
         try:
-            with open(
-                self.config.HISTORY_FILE_PATH, "r", encoding="utf-8"
-            ) as f:
-                data = json.load(f)
-                return data if isinstance(data, list) else []
-        except (json.JSONDecodeError, FileNotFoundError):
+            with open(self.config.HISTORY_FILE_PATH, "rb") as f:
+                yield from self._parse_lines(f)
+        except FileNotFoundError:
+            return
+
+    def _tail_history(self) -> List[Dict]:
+        """Читает последние записи истории, не разбирая весь файл."""
+        try:
+            with open(self.config.HISTORY_FILE_PATH, "rb") as f:
+                size = f.seek(0, os.SEEK_END)
+                start = max(0, size - _HISTORY_TAIL_BYTES)
+                f.seek(start)
+                lines = f.read().split(b"\n")
+        except FileNotFoundError:
             return []
+        if start > 0:
+            # Первая строка куска может оказаться обрезанной
+            lines = lines[1:]
+        return list(self._parse_lines(lines[-_RECENT_IDS_LIMIT:]))
+
+    def _load_recent_ids(self) -> None:
+        self._recent_ids = deque()
+        self._recent_id_set = set()
+        for record in self._tail_history():
+            record_id = record.get("id")
+            if record_id is not None:
+                self._remember_id(record_id)
+
+    def _remember_id(self, record_id: str) -> None:
+        self._recent_ids.append(record_id)
+        self._recent_id_set.add(record_id)
+        if len(self._recent_ids) > _RECENT_IDS_LIMIT:
+            self._recent_id_set.discard(self._recent_ids.popleft())
+
+    def _append_history(self, records: List[Dict]) -> None:
+        """Дописывает записи в конец файла истории одним вызовом write."""
+        file_path = self.config.HISTORY_FILE_PATH
+        data = "".join(
+            json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n"
+            for r in records
+        ).encode("utf-8")
+        try:
+            with open(file_path, "a+b") as f:
+                # Если прошлая запись оборвалась на середине строки,
+                # новая не должна к ней приклеиться
+                if f.seek(0, os.SEEK_END) > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        data = b"\n" + data
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            logger.error(f"Failed to append to {file_path}: {e}")
+            raise
 
-    def _write_history(self, history: List[Dict]) -> None:
-        """Атомарно записывает данные в файл истории."""
-        self._atomic_write(self.config.HISTORY_FILE_PATH, history)
+    def _migrate_legacy_history(self) -> None:
+        """Переносит историю из старого JSON-массива в JSON Lines."""
+        legacy_path = self.config.LEGACY_HISTORY_FILE_PATH
+        if self.config.HISTORY_FILE_PATH.exists() or not legacy_path.exists():
+            return
+        history = self._read_json(legacy_path)
+        if not isinstance(history, list):
+            # Поврежденный файл не удаляем: данные можно восстановить вручную
+            logger.warning(f"Cannot migrate damaged history file {legacy_path}")
+            return
+        if history:
+            self._append_history(history)
+        legacy_path.unlink()
+        logger.info(
+            f"Migrated {len(history)} history records to "
+            f"{self.config.HISTORY_FILE_PATH.name}"
+        )
 
     def _read_rates_cache(self) -> Dict:
         """Читает файл кеша rates.json."""
-        if not self.config.RATES_FILE_PATH.exists():
-            return {}
-        try:
-            with open(self.config.RATES_FILE_PATH, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            return {}
+        data = self._read_json(self.config.RATES_FILE_PATH)
+        return data if data is not None else {}
 
     def _write_rates_cache(self, cache: Dict) -> None:
         """Атомарно записывает данные в файл кеша."""
         self._atomic_write(self.config.RATES_FILE_PATH, cache)
 
+    @staticmethod
+    def _read_json(file_path: Path) -> Any:
+        """Читает JSON-файл; None, если файла нет или он поврежден."""
+        # Файл читаем целиком в байты: json.loads сам определяет UTF-8
+        try:
+            with open(file_path, "rb") as f:
+                return json.loads(f.read())
+        except (json.JSONDecodeError, UnicodeDecodeError, FileNotFoundError):
+            return None
+
     def _atomic_write(self, file_path: Path, data: any) -> None:
         """Выполняет атомарную запись в JSON файл."""
         temp_file = file_path.with_suffix(f"{file_path.suffix}.tmp")
         try:
-            with open(temp_file, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            # Компактный вывод идет через C-энкодер json, в отличие от indent.
+            # Текст кодируется один раз и пишется одним вызовом write
+            text = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+            with open(temp_file, "wb") as f:
+                f.write(text.encode("utf-8"))
             temp_file.replace(file_path)
         except Exception as e:
             logger.error(f"Failed to write to {file_path}: {e}")
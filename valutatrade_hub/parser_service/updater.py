@@ -2,6 +2,8 @@
 Координатор обновления курсов валют (Rates Updater).
 """
 import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timezone
 from typing import Any, Dict, List, Optional
 
@@ -23,29 +25,100 @@ class RatesUpdater:
             "coingecko": CoinGeckoClient(self.config),
             "exchangerate": ExchangeRateApiClient(self.config),
         }
+        # Обновления из CLI и из фонового цикла не должны идти одновременно:
+        # у них общее хранилище и общее состояние клиентов
+        self._update_lock = threading.Lock()
         logger.info(
             "RatesUpdater initialized with clients: %s",
             ", ".join(self.clients.keys()),
         )
 
+    def close(self) -> None:
+        """Закрывает HTTP-сессии всех клиентов."""
+        for client in self.clients.values():
+            client.close()
+
+    def __enter__(self) -> "RatesUpdater":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def run_forever(
+        self,
+        stop_event: Optional[threading.Event] = None,
+        interval: Optional[float] = None,
+    ) -> None:
+        """
+        Обновляет курсы раз в interval секунд, пока не задан stop_event.
+
+        По умолчанию интервал — UPDATE_INTERVAL_SECONDS из конфигурации.
+        Ошибка одного обновления записывается в лог и цикл не останавливает.
+        """
+        if stop_event is None:
+            stop_event = threading.Event()
+        if interval is None:
+            interval = self.config.UPDATE_INTERVAL_SECONDS
+        while not stop_event.is_set():
+            try:
+                self.update_rates()
+            except Exception:
+                logger.exception("Scheduled rates update failed")
+            # wait, а не sleep: остановка срабатывает сразу, без ожидания конца паузы
+            stop_event.wait(interval)
+
+    def start_background(
+        self, interval: Optional[float] = None
+    ) -> threading.Event:
+        """
+        Запускает run_forever в фоновом потоке.
+
+        Returns:
+            Событие, установка которого останавливает цикл.
+        """
+        stop_event = threading.Event()
+        threading.Thread(
+            target=self.run_forever,
+            args=(stop_event, interval),
+            name="rates-updater",
+            daemon=True,
+        ).start()
+        return stop_event
+
     def update_rates(self, source: Optional[str] = None) -> Dict[str, Any]:
         """Обновляет курсы валют и сохраняет их в правильном формате."""
+        with self._update_lock:
+            return self._update_rates(source)
+
+    def _update_rates(self, source: Optional[str]) -> Dict[str, Any]:
         clients_to_run = self._get_clients_to_run(source)
         logger.info(f"Starting rates update from: {list(clients_to_run.keys())}")
 
         timestamp = datetime.now(timezone.utc)
+        # Метку для отчета форматирует storage — так же, как в истории и кеше
+        iso_timestamp = self.storage.format_timestamp(timestamp)
         all_rates_data: Dict[str, Dict[str, Any]] = {}
+        # Курсы каждого источника для истории: запись идет после сбора всех
+        rates_by_source: Dict[str, Dict[str, Dict[str, Any]]] = {}
         sources_info: Dict[str, Dict] = {}
         errors: List[str] = []
 
-        for name, client in clients_to_run.items():
+        for name, fetched in self._fetch_all(clients_to_run).items():
             try:
-                rates_data = client.fetch_rates()
-                if rates_data:
-                    self.storage.save_to_history(rates_data, name, timestamp)
+                rates_data = fetched.result()
+                # Сервер ответил 304: курсы (и их meta) взяты из прошлого
+                # ответа 200, который уже есть в истории. Новой записью
+                # наблюдения они не считаются, но в кеш курсов попадают.
+                not_modified = self.clients[name].not_modified
+                if rates_data and not not_modified:
+                    rates_by_source[name] = rates_data
 
                 all_rates_data.update(rates_data)
-                sources_info[name] = {"success": True, "rates": len(rates_data)}
+                sources_info[name] = {
+                    "success": True,
+                    "rates": len(rates_data),
+                    "not_modified": not_modified,
+                }
             except ApiRequestError as e:
                 error_msg = f"Failed to fetch from {name.capitalize()}: {e}"
                 logger.error(error_msg)
@@ -56,18 +129,46 @@ class RatesUpdater:
                     "rates": 0,
                 }
 
-        # Сохраняем курсы через storage, который теперь знает правильный формат
+        # Сохраняем курсы через storage, который теперь знает правильный формат.
+        # История и кеш — разные файлы: пишем их параллельно, чтобы fsync
+        # истории не задерживал запись кеша
         if all_rates_data:
-            self.storage.update_rates_cache(
-                rates_data=all_rates_data,
-                source="ParserService",
-                timestamp=timestamp
-            )
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                # Все источники уходят в историю одной записью
+                history_saved = executor.submit(
+                    self.storage.save_to_history_bulk,
+                    rates_by_source,
+                    timestamp,
+                )
+                cache_saved = executor.submit(
+                    self.storage.update_rates_cache,
+                    rates_data=all_rates_data,
+                    source="ParserService",
+                    timestamp=timestamp,
+                )
+                # result() пробрасывает ошибки записи, как и раньше
+                history_saved.result()
+                cache_saved.result()
 
         return self._build_report(
-            len(all_rates_data), timestamp, sources_info, errors
+            len(all_rates_data), iso_timestamp, sources_info, errors
         )
 
+    @staticmethod
+    def _fetch_all(clients: Dict[str, BaseApiClient]) -> Dict[str, Future]:
+        """
+        Запрашивает курсы у всех клиентов одновременно.
+
+        Запросы к API — ожидание сети, поэтому в потоках общее время равно
+        самому долгому запросу, а не сумме. Результаты (и ошибки) остаются
+        в Future и обрабатываются вызывающим кодом по порядку клиентов.
+        """
+        with ThreadPoolExecutor(max_workers=len(clients)) as executor:
+            return {
+                name: executor.submit(client.fetch_rates)
+                for name, client in clients.items()
+            }
+
     def _get_clients_to_run(
         self, source: Optional[str]
     ) -> Dict[str, BaseApiClient]:
@@ -81,14 +182,14 @@ class RatesUpdater:
     def _build_report(
         self,
         total_rates: int,
-        timestamp: datetime,
+        iso_timestamp: str,
         sources: Dict,
         errors: List[str],
     ) -> Dict[str, Any]:
         """Собирает итоговый отчет об обновлении."""
         return {
             "success": len(errors) == 0,
-            "timestamp": timestamp.isoformat() + "Z",
+            "timestamp": iso_timestamp,
             "total_rates": total_rates,
             "sources": sources,
         }